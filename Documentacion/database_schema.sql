@@ -22,7 +22,7 @@ CREATE TABLE IF NOT EXISTS sensor_readings (
     id SERIAL PRIMARY KEY,
     
     -- Timestamp de inserción en la BD (UTC por defecto)
-    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    timestamp TIMESTAMP DEFAULT (now() AT TIME ZONE 'UTC'),
     
     -- SENSORES - Permiten NULL para anomalías
     -- Temperatura en grados Celsius (°C)
@@ -74,7 +74,7 @@ CREATE TABLE IF NOT EXISTS events (
     id SERIAL PRIMARY KEY,
     
     -- Timestamp del evento (UTC por defecto)
-    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    timestamp TIMESTAMP DEFAULT (now() AT TIME ZONE 'UTC'),
     
     -- Tipo de evento (para filtrado rápido)
     -- Ejemplos: SYSTEM, MQTT_BRIDGE, LED, ERROR, WARNING
@@ -100,7 +100,7 @@ CREATE TABLE IF NOT EXISTS statistics (
     id SERIAL PRIMARY KEY,
     
     -- Timestamp de la agregación (UTC por defecto)
-    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    timestamp TIMESTAMP DEFAULT (now() AT TIME ZONE 'UTC'),
     
     -- TEMPERATURA
     temp_avg REAL,      -- Promedio (°C)
@@ -150,6 +150,25 @@ COMMENT ON COLUMN statistics.readings_count IS 'Cantidad de lecturas incluidas e
 CREATE INDEX IF NOT EXISTS idx_sensor_timestamp 
 ON sensor_readings(timestamp DESC);
 
+-- Índice cubriente usado por el backend HTTP (app.py) para las últimas N lecturas
+-- Permite Index Only Scan sin Sort (PostgreSQL 11+)
+CREATE INDEX IF NOT EXISTS idx_sensor_ts_desc 
+ON sensor_readings(timestamp DESC)
+INCLUDE (id, temperature, humidity, ldr_percent, ldr_raw, estado);
+
+-- Índice BRIN para rangos de fechas (reportes diarios, limpieza por retención)
+-- La tabla es append-only: timestamp crece con el orden físico y el índice
+-- ocupa unas pocas páginas frente a un B-tree completo
+CREATE INDEX IF NOT EXISTS idx_sensor_ts_brin 
+ON sensor_readings USING BRIN (timestamp) WITH (pages_per_range = 32);
+
+-- Índices parciales para conteo de anomalías (solo filas con NULL)
+CREATE INDEX IF NOT EXISTS idx_sr_temp_null 
+ON sensor_readings(id) WHERE temperature IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_sr_hum_null 
+ON sensor_readings(id) WHERE humidity IS NULL;
+
 -- Índice para filtrado por nivel de confort
 CREATE INDEX IF NOT EXISTS idx_sensor_comfort 
 ON sensor_readings(comfort_level);
@@ -6,22 +6,45 @@ Lee datos de Adafruit IO y los almacena en Railway
 ✨ Maneja "ANOMALIA" en lugar de NULL/None para tracking
 """
 
+import io
+import math
 import os
+import queue
+import re
+import struct
+import threading
 import time
 import json
-from datetime import datetime
+import logging
+import sys
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
 import psycopg2
-from psycopg2.extras import RealDictCursor
+import psycopg2.pool
+from psycopg2.extras import execute_batch
 import paho.mqtt.client as mqtt
 
 # ==================== CONFIGURACIÓN ====================
 
+### LOGS ###
+# Mensajes del camino caliente (por mensaje MQTT / por lote) usan log con
+# formato diferido: log.debug("...%s", x) no formatea si el nivel está apagado
+# Nivel configurable: LOG_LEVEL=DEBUG muestra cada mensaje MQTT recibido
+log = logging.getLogger("bridge")
+log.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+_log_handler = logging.StreamHandler(sys.stdout)
+_log_handler.setFormatter(logging.Formatter('%(message)s'))
+log.addHandler(_log_handler)
+log.propagate = False
+
 ### CREDENCIALES ADAFRUIT IO ###
 # Usa SOLO variables de entorno por seguridad
 ADAFRUIT_USERNAME = os.environ.get('ADAFRUIT_USERNAME')
 ADAFRUIT_KEY = os.environ.get('ADAFRUIT_KEY')
 ADAFRUIT_HOST = "io.adafruit.com"
 ADAFRUIT_PORT = 1883
+MQTT_QOS = 0  # Suscripciones de solo lectura: el bridge nunca publica
 
 # Validación de credenciales
 if not ADAFRUIT_USERNAME or not ADAFRUIT_KEY:
@@ -53,15 +76,28 @@ if not DATABASE_URL:
 
 ### BUFFER DE DATOS ###
 # Acumula datos hasta recibir todos los campos necesarios
-data_buffer = {
-    'temperature': None,
-    'humidity': None,
-    'ldr_percent': None,
-    'ldr_raw': None,
-    'estado': None,
-    'comfort': None,
-    'last_update': None
-}
+class SensorBuffer:
+    """
+    Lectura en construcción a partir de los feeds MQTT
+    __slots__: atributos fijos, sin dict por instancia ni hashing de claves
+    """
+    __slots__ = ('temperature', 'humidity', 'ldr_percent', 'ldr_raw',
+                 'estado', 'comfort', 'last_update')
+    
+    def __init__(self):
+        self.reset()
+    
+    def reset(self):
+        """Limpia la lectura en el mismo objeto, sin crear uno nuevo"""
+        self.temperature = None
+        self.humidity = None
+        self.ldr_percent = None
+        self.ldr_raw = None
+        self.estado = None
+        self.comfort = None
+        self.last_update = None
+
+data_buffer = SensorBuffer()
 
 ### CONFIGURACIÓN DE RECONEXIÓN ###
 BUFFER_TIMEOUT = 60     # Segundos antes de guardar datos parciales
@@ -69,25 +105,140 @@ reconnect_count = 0
 max_reconnects = 5
 reading_counter = 0     # Contador global de lecturas
 
+### DEDUPLICACIÓN ###
+# Adafruit IO puede reenviar el mismo conjunto de feeds: se descarta si coincide
+# con la última lectura guardada y llega dentro de DEDUP_WINDOW. El estado solo
+# tiene resolución de minuto y el dispositivo publica cada 20 s, así que dos
+# lecturas estables idénticas no son reenvíos si están separadas por un ciclo
+DEDUP_WINDOW = 5        # Segundos; bastante menos que el periodo de publicación
+_last_hash = None
+_last_hash_ts = 0.0     # time.monotonic() de la última lectura encolada
+duplicates_skipped = 0  # Se reporta y reinicia con el dashboard
+
+### ESCRITURA POR LOTES ###
+# on_message arma las lecturas y las encola; writer_loop (hilo aparte) las
+# inserta por lotes, así el loop de red de paho nunca espera a la BD
+BATCH_SIZE = 50         # Filas máximas por INSERT
+FLUSH_INTERVAL = 0.5    # Segundos máximos entre guardados (flush_interval_ms = 500)
+COPY_THRESHOLD = 200    # Desde este tamaño (ej: reintento tras caída de BD) se usa COPY
+WRITE_QUEUE_MAX = 10000 # Cola acotada: si la BD no da abasto se descarta y se avisa
+RETRY_DELAY_MIN = 1     # Segundos de espera tras el primer fallo de conexión a BD
+RETRY_DELAY_MAX = 30    # Tope del backoff exponencial entre reintentos
+write_queue = queue.Queue(maxsize=WRITE_QUEUE_MAX)
+dropped_writes = 0      # Escrituras descartadas por cola llena
+pending_rows = []       # Lote en curso (solo lo toca writer_loop)
+_buffer_lock = threading.RLock()  # Callback MQTT y loop principal comparten el buffer
+_STOP = object()        # Marcador para detener writer_loop al salir
+
+### CACHÉ DEL DASHBOARD ###
+# Las agregaciones solo cambian si se insertan lecturas (de este bridge o de
+# app.py): se reutilizan mientras la secuencia de ids no avance. El TTL acota
+# la antigüedad ante borrados o UPDATEs, que no mueven la secuencia
+DASHBOARD_CACHE_TTL = 3600
+_DASH_CACHE = {"ts": float("-inf"), "key": None, "data": None}
+
+### MIGRACIONES ###
+# Mismo id que app.py: bridge y backend no ejecutan DDL a la vez
+MIGRATION_LOCK_ID = 42
+BACKFILL_BATCH_SIZE = 10000  # Filas por transacción al numerar lecturas antiguas
+
 ### MARCADOR DE ANOMALÍAS ###
 ANOMALIA = "ANOMALIA"   # String especial para valores inválidos
 
+### PARSEO DE ESTADÍSTICAS ###
+# Un campo "X:prom(min-max)" por métrica; admite negativos (ej: T:-2.5(-8.0-3.1))
+_NUM = r'(-?\d+(?:\.\d+)?)'
+STATS_RE = re.compile(rf'([THL]):{_NUM}\({_NUM}-{_NUM}\)')
+DHT_RE = re.compile(_NUM)  # Temperatura/humedad: solo número simple (fullmatch)
+
 # ==================== BASE DE DATOS ====================
 
-def get_db_connection():
+### POOL DE CONEXIONES ###
+# Conexiones persistentes para toda la vida del proceso: sin handshake TLS +
+# auth por cada escritura. Lo usan writer_loop, el callback MQTT y el dashboard
+DB_POOL_MIN = 1
+DB_POOL_MAX = 4
+DB_POOL = None
+_pool_lock = threading.Lock()
+
+### SENTENCIAS PREPARADAS ###
+# INSERTs del bridge preparados en el servidor (PREPARE/EXECUTE): PostgreSQL
+# reutiliza el plan en cada lectura en lugar de parsear y planificar de nuevo
+PREPARED_STATEMENTS = {
+    'ins_sensor': '''
+        INSERT INTO sensor_readings
+        (temperature, humidity, ldr_percent, ldr_raw, estado,
+         comfort_level, reading_number, timestamp)
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+    ''',
+    'ins_stats': '''
+        INSERT INTO statistics
+        (temp_avg, temp_min, temp_max, hum_avg, hum_min, hum_max,
+         ldr_avg, ldr_min, ldr_max)
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+        RETURNING id
+    ''',
+    'ins_event': '''
+        INSERT INTO events (event_type, description)
+        VALUES ($1, $2)
+        RETURNING id
+    ''',
+}
+
+class PreparedConnection(psycopg2.extensions.connection):
+    """Conexión que recuerda qué sentencias ya preparó en su sesión"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+def prepare_once(conn, cursor, name):
     """
-    Crea conexión a PostgreSQL en Railway
+    Preparar una sentencia de PREPARED_STATEMENTS la primera vez que se usa
+    en cada conexión del pool (las sentencias preparadas no se deshacen con ROLLBACK)
     
     Returns:
-        connection: Objeto de conexión psycopg2
-        None: Si falla la conexión
+        str: EXECUTE con un placeholder por parámetro, listo para cursor.execute
+    """
+    if name not in conn.prepared:
+        cursor.execute(f'PREPARE {name} AS {PREPARED_STATEMENTS[name]}')
+        conn.prepared.add(name)
+    nparams = PREPARED_STATEMENTS[name].count('$')
+    return f"EXECUTE {name} ({', '.join(['%s'] * nparams)})"
+
+def get_pool():
+    """Crear el pool de conexiones en el primer uso"""
+    global DB_POOL
+    if DB_POOL is None:
+        with _pool_lock:
+            if DB_POOL is None:
+                DB_POOL = psycopg2.pool.ThreadedConnectionPool(
+                    DB_POOL_MIN, DB_POOL_MAX, dsn=DATABASE_URL,
+                    connection_factory=PreparedConnection
+                )
+    return DB_POOL
+
+@contextmanager
+def db_connection():
+    """
+    Presta una conexión del pool y la devuelve al salir
+    
+    El commit es explícito en cada función; si hay error se hace rollback
+    y si la conexión se cayó (OperationalError) se descarta del pool
     """
+    pool = get_pool()
+    conn = pool.getconn()
+    broken = False
     try:
-        conn = psycopg2.connect(DATABASE_URL)
-        return conn
-    except Exception as e:
-        print(f"❌ Error conectando a BD: {e}")
-        return None
+        yield conn
+    except psycopg2.OperationalError:
+        broken = True
+        raise
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn, close=broken or conn.closed != 0)
 
 def run_migration():
     """
@@ -110,131 +261,128 @@ def run_migration():
     print("\n🔧 Ejecutando auto-migración de base de datos...")
     
     try:
-        conn = get_db_connection()
-        if not conn:
-            print("❌ No se pudo conectar para migración")
-            return False
-        
-        cursor = conn.cursor()
-        
-        ### PASO 1: Verificar columnas existentes ###
-        cursor.execute("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name='sensor_readings'
-        """)
-        existing_columns = [row[0] for row in cursor.fetchall()]
-        print(f"   📋 Columnas actuales: {', '.join(existing_columns)}")
-        
-        migrations_applied = []
-        
-        ### PASO 2: Agregar comfort_level ###
-        if 'comfort_level' not in existing_columns:
-            print("   ⚙️  Agregando columna 'comfort_level'...")
-            cursor.execute("""
-                ALTER TABLE sensor_readings 
-                ADD COLUMN comfort_level VARCHAR(50)
-            """)
-            migrations_applied.append('comfort_level')
-        else:
-            print("   ✓ Columna 'comfort_level' ya existe")
-        
-        ### PASO 3: Agregar reading_number ###
-        if 'reading_number' not in existing_columns:
-            print("   ⚙️  Agregando columna 'reading_number'...")
-            cursor.execute("""
-                ALTER TABLE sensor_readings 
-                ADD COLUMN reading_number INTEGER
-            """)
-            migrations_applied.append('reading_number')
-        else:
-            print("   ✓ Columna 'reading_number' ya existe")
-        
-        ### PASO 4: Crear tabla statistics ###
-        print("   ⚙️  Verificando tabla 'statistics'...")
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS statistics (
-                id SERIAL PRIMARY KEY,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                temp_avg REAL,
-                temp_min REAL,
-                temp_max REAL,
-                hum_avg REAL,
-                hum_min REAL,
-                hum_max REAL,
-                ldr_avg REAL,
-                ldr_min REAL,
-                ldr_max REAL,
-                readings_count INTEGER
-            )
-        """)
-        
-        ### PASO 5: Crear índices para optimización ###
-        print("   ⚙️  Creando índices...")
-        
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_sensor_comfort 
-            ON sensor_readings(comfort_level)
-        """)
-        
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_sensor_reading_num 
-            ON sensor_readings(reading_number)
-        """)
-        
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_stats_timestamp 
-            ON statistics(timestamp DESC)
-        """)
-        
-        ### PASO 6: Rellenar reading_number para datos existentes ###
-        if 'reading_number' in migrations_applied:
-            print("   ⚙️  Asignando números de lectura a datos existentes...")
-            cursor.execute("""
-                WITH numbered_readings AS (
-                    SELECT id, ROW_NUMBER() OVER (ORDER BY timestamp) as rn
-                    FROM sensor_readings
-                    WHERE reading_number IS NULL
-                )
-                UPDATE sensor_readings sr
-                SET reading_number = nr.rn
-                FROM numbered_readings nr
-                WHERE sr.id = nr.id
-            """)
-            updated_rows = cursor.rowcount
-            if updated_rows > 0:
-                print(f"   ✓ {updated_rows} lecturas numeradas")
-        
-        ### CONFIRMAR CAMBIOS ###
-        conn.commit()
-        
-        if migrations_applied:
-            print(f"\n✅ Migración completada: {', '.join(migrations_applied)}")
-        else:
-            print("\n✅ Base de datos ya está actualizada")
-        
-        ### VERIFICACIÓN FINAL ###
-        cursor.execute("SELECT COUNT(*) FROM sensor_readings")
-        sensor_count = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM events")
-        events_count = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM statistics")
-        stats_count = cursor.fetchone()[0]
-        
-        print(f"\n📊 Estado de la base de datos:")
-        print(f"   • sensor_readings: {sensor_count} registros")
-        print(f"   • events: {events_count} registros")
-        print(f"   • statistics: {stats_count} registros")
-        
-        cursor.close()
-        conn.close()
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            # Bloqueo de sesión, no de transacción: el commit del paso 5 no lo
+            # libera y el relleno por lotes del paso 6 también corre en exclusiva
+            cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+            try:
+                ### PASO 1: Verificar columnas existentes ###
+                cursor.execute("""
+                    SELECT column_name 
+                    FROM information_schema.columns 
+                    WHERE table_name='sensor_readings'
+                """)
+                existing_columns = [row[0] for row in cursor.fetchall()]
+                print(f"   📋 Columnas actuales: {', '.join(existing_columns)}")
+            
+                migrations_applied = [
+                    col for col in ('comfort_level', 'reading_number')
+                    if col not in existing_columns
+                ]
+                for col in ('comfort_level', 'reading_number'):
+                    if col in migrations_applied:
+                        print(f"   ⚙️  Agregando columna '{col}'...")
+                    else:
+                        print(f"   ✓ Columna '{col}' ya existe")
+            
+                ### PASOS 2-5: Columnas, tabla statistics e índices ###
+                # IF NOT EXISTS hace el DDL idempotente: todo va en un solo viaje a BD
+                print("   ⚙️  Verificando tabla 'statistics' e índices...")
+                cursor.execute("""
+                    ALTER TABLE sensor_readings
+                        ADD COLUMN IF NOT EXISTS comfort_level VARCHAR(50),
+                        ADD COLUMN IF NOT EXISTS reading_number INTEGER;
+                
+                    CREATE TABLE IF NOT EXISTS statistics (
+                        id SERIAL PRIMARY KEY,
+                        timestamp TIMESTAMP DEFAULT (now() AT TIME ZONE 'UTC'),
+                        temp_avg REAL,
+                        temp_min REAL,
+                        temp_max REAL,
+                        hum_avg REAL,
+                        hum_min REAL,
+                        hum_max REAL,
+                        ldr_avg REAL,
+                        ldr_min REAL,
+                        ldr_max REAL,
+                        readings_count INTEGER
+                    );
+                
+                    ALTER TABLE statistics
+                        ALTER COLUMN timestamp SET DEFAULT (now() AT TIME ZONE 'UTC');
+                
+                    CREATE INDEX IF NOT EXISTS idx_sensor_comfort 
+                    ON sensor_readings(comfort_level);
+                
+                    CREATE INDEX IF NOT EXISTS idx_sensor_reading_num 
+                    ON sensor_readings(reading_number);
+                
+                    CREATE INDEX IF NOT EXISTS idx_stats_timestamp 
+                    ON statistics(timestamp DESC);
+                """)
+            
+                ### CONFIRMAR CAMBIOS ###
+                conn.commit()
+            
+                ### PASO 6: Rellenar reading_number para datos existentes ###
+                # Por lotes con commit en cada uno: WAL y bloqueos acotados en tablas grandes
+                if 'reading_number' in migrations_applied:
+                    print("   ⚙️  Asignando números de lectura a datos existentes...")
+                    updated_rows = 0
+                    while True:
+                        cursor.execute("""
+                            UPDATE sensor_readings sr
+                            SET reading_number = sub.rn
+                            FROM (
+                                SELECT id, ROW_NUMBER() OVER (ORDER BY timestamp, id) + %s AS rn
+                                FROM (
+                                    SELECT id, timestamp
+                                    FROM sensor_readings
+                                    WHERE reading_number IS NULL
+                                    ORDER BY timestamp, id
+                                    LIMIT %s
+                                ) page
+                            ) sub
+                            WHERE sr.id = sub.id
+                        """, (updated_rows, BACKFILL_BATCH_SIZE))
+                        batch = cursor.rowcount
+                        conn.commit()
+                        if batch == 0:
+                            break
+                        updated_rows += batch
+                    if updated_rows > 0:
+                        print(f"   ✓ {updated_rows} lecturas numeradas")
+            
+                if migrations_applied:
+                    print(f"\n✅ Migración completada: {', '.join(migrations_applied)}")
+                else:
+                    print("\n✅ Base de datos ya está actualizada")
+            
+                ### VERIFICACIÓN FINAL ###
+                cursor.execute("SELECT COUNT(*) FROM sensor_readings")
+                sensor_count = cursor.fetchone()[0]
+                cursor.execute("SELECT COUNT(*) FROM events")
+                events_count = cursor.fetchone()[0]
+                cursor.execute("SELECT COUNT(*) FROM statistics")
+                stats_count = cursor.fetchone()[0]
+            
+                print(f"\n📊 Estado de la base de datos:")
+                print(f"   • sensor_readings: {sensor_count} registros")
+                print(f"   • events: {events_count} registros")
+                print(f"   • statistics: {stats_count} registros")
+            finally:
+                if not conn.closed:
+                    conn.rollback()
+                    cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+                    conn.commit()
+            
+            cursor.close()
         
         return True
         
     except Exception as e:
         print(f"\n❌ Error durante migración: {e}")
-        if conn:
-            conn.rollback()
         return False
 
 def init_database():
@@ -250,51 +398,74 @@ def init_database():
         bool: True si inicialización exitosa
     """
     try:
-        conn = get_db_connection()
-        if not conn:
-            return False
-        
-        cursor = conn.cursor()
-        
-        ### TABLA: sensor_readings ###
-        # Almacena todas las lecturas de sensores
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sensor_readings (
-                id SERIAL PRIMARY KEY,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                temperature REAL,              -- NULL si ANOMALIA
-                humidity REAL,                 -- NULL si ANOMALIA
-                ldr_percent REAL NOT NULL,     -- Siempre válido
-                ldr_raw INTEGER NOT NULL,      -- Siempre válido
-                estado VARCHAR(20) NOT NULL    -- Timestamp del dispositivo
-            )
-        ''')
-        
-        ### TABLA: events ###
-        # Registra eventos del sistema (conexiones, errores, etc.)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS events (
-                id SERIAL PRIMARY KEY,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                event_type VARCHAR(50) NOT NULL,
-                description TEXT NOT NULL
-            )
-        ''')
-        
-        ### ÍNDICES BASE ###
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_sensor_timestamp 
-            ON sensor_readings(timestamp DESC)
-        ''')
-        
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_events_timestamp 
-            ON events(timestamp DESC)
-        ''')
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+            
+            ### TABLA: sensor_readings ###
+            # Almacena todas las lecturas de sensores
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS sensor_readings (
+                    id SERIAL PRIMARY KEY,
+                    timestamp TIMESTAMP DEFAULT (now() AT TIME ZONE 'UTC'),
+                    temperature REAL,              -- NULL si ANOMALIA
+                    humidity REAL,                 -- NULL si ANOMALIA
+                    ldr_percent REAL NOT NULL,     -- Siempre válido
+                    ldr_raw INTEGER NOT NULL,      -- Siempre válido
+                    estado VARCHAR(20) NOT NULL    -- Timestamp del dispositivo
+                )
+            ''')
+            
+            ### TABLA: events ###
+            # Registra eventos del sistema (conexiones, errores, etc.)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS events (
+                    id SERIAL PRIMARY KEY,
+                    timestamp TIMESTAMP DEFAULT (now() AT TIME ZONE 'UTC'),
+                    event_type VARCHAR(50) NOT NULL,
+                    description TEXT NOT NULL
+                )
+            ''')
+            
+            ### TIMESTAMPS EN UTC ###
+            # build_sensor_row guarda la hora UTC; los defaults usan el mismo
+            # reloj para que las filas de app.py y los eventos no dependan de la
+            # zona horaria de la sesión (también en tablas ya creadas)
+            cursor.execute('''
+                ALTER TABLE sensor_readings
+                    ALTER COLUMN timestamp SET DEFAULT (now() AT TIME ZONE 'UTC');
+                ALTER TABLE events
+                    ALTER COLUMN timestamp SET DEFAULT (now() AT TIME ZONE 'UTC');
+            ''')
+            
+            ### ÍNDICES BASE ###
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_sensor_timestamp 
+                ON sensor_readings(timestamp DESC)
+            ''')
+            
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_events_timestamp 
+                ON events(timestamp DESC)
+            ''')
+            
+            ### ÍNDICES PARCIALES DE ANOMALÍAS ###
+            # Solo contienen las lecturas con NULL: el conteo de anomalías del
+            # dashboard lee estos índices pequeños en lugar de toda la tabla
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_sr_temp_null 
+                ON sensor_readings(id) WHERE temperature IS NULL
+            ''')
+            
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_sr_hum_null 
+                ON sensor_readings(id) WHERE humidity IS NULL
+            ''')
+            
+            cursor.execute('ANALYZE sensor_readings')
+            
+            conn.commit()
+            cursor.close()
         
         print("✅ Tablas base inicializadas")
         
@@ -305,9 +476,9 @@ def init_database():
         print(f"❌ Error inicializando BD: {e}")
         return False
 
-def save_sensor_reading(temperature, humidity, ldr_percent, ldr_raw, estado, comfort_level=None, reading_number=None):
+def build_sensor_row(temperature, humidity, ldr_percent, ldr_raw, estado, comfort_level=None, reading_number=None):
     """
-    Guarda una lectura de sensores en PostgreSQL
+    Convierte una lectura de sensores en la fila que se inserta en PostgreSQL
     
     Args:
         temperature: Temperatura en °C, "ANOMALIA", o None
@@ -324,57 +495,237 @@ def save_sensor_reading(temperature, humidity, ldr_percent, ldr_raw, estado, com
         - Mantiene registro de cuántas lecturas fallaron
     
     Returns:
-        bool: True si guardado exitoso
+        tuple: Fila para execute_batch/COPY (incluye hora de recepción en UTC)
     """
-    try:
-        conn = get_db_connection()
-        if not conn:
-            return False
-        
-        cursor = conn.cursor()
-        
-        ### CONVERSIÓN DE ANOMALÍAS A NULL ###
-        if temperature == ANOMALIA or temperature == "N/A" or temperature is None:
+    ### CONVERSIÓN DE ANOMALÍAS A NULL ###
+    if temperature == ANOMALIA or temperature == "N/A" or temperature is None:
+        temperature = None
+    else:
+        try:
+            temperature = float(temperature)
+        except:
             temperature = None
+        
+    if humidity == ANOMALIA or humidity == "N/A" or humidity is None:
+        humidity = None
+    else:
+        try:
+            humidity = float(humidity)
+        except:
+            humidity = None
+    
+    # La fila puede esperar en el lote: se guarda la hora de recepción, no la del INSERT
+    # La columna es TIMESTAMP sin zona en UTC: un valor con tzinfo se convertiría
+    # a la zona horaria de la sesión, por eso se quita tras tomar la hora UTC
+    return (temperature, humidity, ldr_percent, ldr_raw, estado,
+            comfort_level, reading_number, datetime.now(timezone.utc).replace(tzinfo=None))
+
+def enqueue_write(kind, payload):
+    """
+    Encola una escritura para writer_loop sin bloquear el callback MQTT
+    
+    Args:
+        kind (str): 'sensor' (fila), 'stats' (string) o 'event' (tipo, descripción)
+    """
+    global dropped_writes
+    try:
+        write_queue.put_nowait((kind, payload))
+    except queue.Full:
+        dropped_writes += 1
+        log.warning("⚠️  Cola de escritura llena - %s descartado (%d en total)", kind, dropped_writes)
+
+def writer_loop():
+    """
+    Hilo de escritura: guarda el lote al llegar a BATCH_SIZE filas O cuando
+    pasan FLUSH_INTERVAL segundos desde el último guardado (lo que ocurra
+    primero), independiente del ritmo del feed 'estado'
+    
+    Estadísticas y eventos se guardan en cuanto llegan
+    
+    Cada despertar vacía todo lo que ya esté en la cola (get_nowait) antes
+    de volver a dormir: una ráfaga MQTT cuesta un cambio de hilo, no uno
+    por mensaje
+    
+    Si la BD no responde, el lote se reintenta con backoff exponencial
+    (RETRY_DELAY_MIN → RETRY_DELAY_MAX). pending_rows no pasa de
+    WRITE_QUEUE_MAX filas: con el lote lleno se deja de vaciar la cola y
+    enqueue_write descarta y avisa, en lugar de crecer sin límite
+    """
+    last_flush = time.monotonic()
+    retry_delay = 0  # Espera actual entre reintentos (0: BD disponible)
+    while True:
+        interval = retry_delay or FLUSH_INTERVAL
+        timeout = max(0, interval - (time.monotonic() - last_flush))
+        room = WRITE_QUEUE_MAX - len(pending_rows)
+        
+        if room <= 0:
+            # Lote lleno esperando a la BD: la cola se llena y descarta
+            time.sleep(timeout)
+            items = []
         else:
             try:
-                temperature = float(temperature)
-            except:
-                temperature = None
+                items = [write_queue.get(timeout=timeout)]
+            except queue.Empty:
+                items = []
             
-        if humidity == ANOMALIA or humidity == "N/A" or humidity is None:
-            humidity = None
-        else:
+            while len(items) < room:
+                try:
+                    items.append(write_queue.get_nowait())
+                except queue.Empty:
+                    break
+        
+        for item in items:
+            if item is _STOP:
+                _flush_rows()
+                return
+            
+            kind, payload = item
+            if kind == 'sensor':
+                pending_rows.append(payload)
+            elif kind == 'stats':
+                save_statistics(payload)
+            elif kind == 'event':
+                save_event(*payload)
+        
+        now = time.monotonic()  # Una lectura del reloj por iteración
+        # Durante el backoff solo se reintenta al vencer la espera
+        if ((len(pending_rows) >= BATCH_SIZE and not retry_delay)
+                or now - last_flush >= interval):
+            _flush_rows()
+            if pending_rows:
+                # Siguen pendientes (BD caída): esperar más antes del próximo intento
+                retry_delay = min(max(retry_delay * 2, RETRY_DELAY_MIN), RETRY_DELAY_MAX)
+            else:
+                retry_delay = 0
+            last_flush = now
+
+### COPY BINARIO ###
+# Formato binario de COPY: el servidor recibe los valores ya codificados
+# (float4/int4/int8 big-endian) y se salta el parseo de texto por campo
+# Los tipos deben coincidir con la tabla: REAL, INTEGER, VARCHAR, TIMESTAMP
+_PGCOPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('!ii', 0, 0)
+_PGCOPY_TRAILER = struct.pack('!h', -1)
+_PGCOPY_NFIELDS = struct.pack('!h', 8)
+_PGCOPY_NULL = struct.pack('!i', -1)
+_PG_FLOAT4 = struct.Struct('!if')   # longitud de campo + valor
+_PG_INT4 = struct.Struct('!ii')
+_PG_INT8 = struct.Struct('!iq')
+_PG_EPOCH = datetime(2000, 1, 1)    # TIMESTAMP binario: µs desde 2000-01-01
+
+def _pg_text(value):
+    """VARCHAR en binario: longitud + bytes UTF-8 (None → NULL)"""
+    if value is None:
+        return _PGCOPY_NULL
+    data = value.encode('utf-8')
+    return struct.pack('!i', len(data)) + data
+
+def copy_sensor_rows(cursor, rows):
+    """
+    Carga un lote grande con COPY FROM STDIN (formato binario)
+    None se escribe con longitud -1, que COPY interpreta como NULL
+    """
+    buf = io.BytesIO()
+    write = buf.write
+    write(_PGCOPY_HEADER)
+    for temp, hum, ldr_pct, ldr_raw, estado, comfort, number, ts in rows:
+        write(_PGCOPY_NFIELDS)
+        write(_PGCOPY_NULL if temp is None else _PG_FLOAT4.pack(4, temp))
+        write(_PGCOPY_NULL if hum is None else _PG_FLOAT4.pack(4, hum))
+        write(_PG_FLOAT4.pack(4, ldr_pct))
+        write(_PG_INT4.pack(4, ldr_raw))
+        write(_pg_text(estado))
+        write(_pg_text(comfort))
+        write(_PGCOPY_NULL if number is None else _PG_INT4.pack(4, number))
+        delta = ts - _PG_EPOCH
+        write(_PG_INT8.pack(8, (delta.days * 86400 + delta.seconds) * 1000000
+                            + delta.microseconds))
+    write(_PGCOPY_TRAILER)
+    buf.seek(0)
+    cursor.copy_expert('''
+        COPY sensor_readings
+        (temperature, humidity, ldr_percent, ldr_raw, estado,
+         comfort_level, reading_number, timestamp)
+        FROM STDIN WITH (FORMAT binary)
+    ''', buf)
+
+def _insert_rows_one_by_one(conn, rows):
+    """
+    Último recurso si el lote completo falla: cada fila en su propio
+    SAVEPOINT, así una fila inválida se descarta sin perder las demás
+    
+    Returns:
+        int: Filas descartadas
+    """
+    dropped = 0
+    with conn.cursor() as cursor:
+        cursor.execute("SET LOCAL synchronous_commit = off")
+        sql = prepare_once(conn, cursor, 'ins_sensor')
+        for row in rows:
+            cursor.execute("SAVEPOINT fila")
             try:
-                humidity = float(humidity)
-            except:
-                humidity = None
-        
-        ### INSERCIÓN EN BD ###
-        cursor.execute('''
-            INSERT INTO sensor_readings 
-            (temperature, humidity, ldr_percent, ldr_raw, estado, comfort_level, reading_number)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            RETURNING id
-        ''', (temperature, humidity, ldr_percent, ldr_raw, estado, comfort_level, reading_number))
-        
-        record_id = cursor.fetchone()[0]
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        ### LOG CON FORMATO LEGIBLE ###
-        temp_display = f"{temperature}°C" if temperature is not None else ANOMALIA
-        hum_display = f"{humidity}%" if humidity is not None else ANOMALIA
-        comfort_str = f" [{comfort_level}]" if comfort_level else ""
-        
-        print(f"✅ Lectura #{reading_number or '?'} guardada (ID:{record_id}) - "
-              f"T:{temp_display} H:{hum_display} LDR:{ldr_percent}% {estado}{comfort_str}")
+                cursor.execute(sql, row)
+            except psycopg2.OperationalError:
+                raise
+            except Exception as e:
+                cursor.execute("ROLLBACK TO SAVEPOINT fila")
+                dropped += 1
+                log.error("❌ Lectura #%s descartada: %s", row[6] or '?', e)
+            else:
+                cursor.execute("RELEASE SAVEPOINT fila")
+    conn.commit()
+    return dropped
+
+def _flush_rows():
+    """
+    Inserta todas las filas pendientes en una sola transacción + commit
+    (EXECUTE preparado en lotes, o COPY binario para lotes grandes)
+    
+    Si la conexión se cayó, las filas quedan pendientes para el próximo intento
+    Si el lote falla por otro motivo (una fila inválida, un error de
+    codificación de COPY), se reintenta fila por fila y solo se descartan
+    las filas que fallan
+    
+    Returns:
+        bool: True si guardado exitoso (o no había filas)
+    """
+    if not pending_rows:
         return True
-        
+    
+    total = len(pending_rows)
+    first, last = pending_rows[0][6], pending_rows[-1][6]
+    dropped = 0
+    try:
+        try:
+            with db_connection() as conn:
+                with conn.cursor() as cursor:
+                    # Telemetría: el COMMIT no espera el fsync del WAL (solo esta transacción)
+                    cursor.execute("SET LOCAL synchronous_commit = off")
+                    if total >= COPY_THRESHOLD:
+                        copy_sensor_rows(cursor, pending_rows)
+                    else:
+                        # Varios EXECUTE por viaje, todos con el plan ya preparado
+                        execute_batch(cursor, prepare_once(conn, cursor, 'ins_sensor'),
+                                      pending_rows, page_size=BATCH_SIZE)
+                conn.commit()
+        except psycopg2.OperationalError:
+            raise
+        except Exception as e:
+            log.error("❌ Error guardando lote de %d lecturas: %s - reintentando fila por fila", total, e)
+            with db_connection() as conn:
+                dropped = _insert_rows_one_by_one(conn, pending_rows)
+        
+    except psycopg2.OperationalError as e:
+        log.error("❌ Conexión perdida guardando lote (%d pendientes): %s", total, e)
+        return False
     except Exception as e:
-        print(f"❌ Error guardando lectura: {e}")
+        # Falla incluso fila por fila sin ser un error de conexión: no reintentar
+        log.error("❌ Error guardando lote de %d lecturas: %s", total, e)
+        pending_rows.clear()
         return False
+    
+    log.info("✅ %d lecturas guardadas (#%s - #%s)", total - dropped, first or '?', last or '?')
+    pending_rows.clear()
+    return True
 
 def save_statistics(stats_data):
     """
@@ -391,59 +742,34 @@ def save_statistics(stats_data):
         bool: True si guardado exitoso
     """
     try:
-        conn = get_db_connection()
-        if not conn:
-            return False
-        
-        cursor = conn.cursor()
-        
-        ### PARSEO DEL STRING DE ESTADÍSTICAS ###
-        parts = stats_data.split()
-        
-        temp_data = None
-        hum_data = None
-        ldr_data = None
-        
-        for part in parts:
-            if part.startswith('T:'):
-                temp_data = part[2:]
-            elif part.startswith('H:'):
-                hum_data = part[2:]
-            elif part.startswith('L:'):
-                ldr_data = part[2:]
-        
-        def parse_stat(data_str):
-            """Parsea '25.3(18.5-32.1)' → (25.3, 18.5, 32.1)"""
-            if not data_str or '(' not in data_str:
-                return None, None, None
-            avg_str, range_str = data_str.split('(')
-            min_str, max_str = range_str.rstrip(')').split('-')
-            return float(avg_str), float(min_str), float(max_str)
-        
-        temp_avg, temp_min, temp_max = parse_stat(temp_data)
-        hum_avg, hum_min, hum_max = parse_stat(hum_data)
-        ldr_avg, ldr_min, ldr_max = parse_stat(ldr_data)
-        
-        ### INSERCIÓN EN BD ###
-        cursor.execute('''
-            INSERT INTO statistics 
-            (temp_avg, temp_min, temp_max, hum_avg, hum_min, hum_max, 
-             ldr_avg, ldr_min, ldr_max)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING id
-        ''', (temp_avg, temp_min, temp_max, hum_avg, hum_min, hum_max,
-              ldr_avg, ldr_min, ldr_max))
-        
-        stat_id = cursor.fetchone()[0]
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            
+            ### PARSEO DEL STRING DE ESTADÍSTICAS ###
+            # Una sola pasada del regex compilado; métricas ausentes quedan en None
+            parsed = {
+                m.group(1): (float(m.group(2)), float(m.group(3)), float(m.group(4)))
+                for m in STATS_RE.finditer(stats_data)
+            }
+            
+            temp_avg, temp_min, temp_max = parsed.get('T', (None, None, None))
+            hum_avg, hum_min, hum_max = parsed.get('H', (None, None, None))
+            ldr_avg, ldr_min, ldr_max = parsed.get('L', (None, None, None))
+            
+            ### INSERCIÓN EN BD ###
+            cursor.execute(prepare_once(conn, cursor, 'ins_stats'),
+                           (temp_avg, temp_min, temp_max, hum_avg, hum_min, hum_max,
+                            ldr_avg, ldr_min, ldr_max))
+            
+            stat_id = cursor.fetchone()[0]
+            conn.commit()
+            cursor.close()
         
-        print(f"📊 Estadísticas guardadas (ID:{stat_id}) - {stats_data}")
+        log.info("📊 Estadísticas guardadas (ID:%s) - %s", stat_id, stats_data)
         return True
         
     except Exception as e:
-        print(f"❌ Error guardando estadísticas: {e}")
+        log.error("❌ Error guardando estadísticas: %s", e)
         return False
 
 def save_event(event_type, description):
@@ -464,28 +790,21 @@ def save_event(event_type, description):
         bool: True si guardado exitoso
     """
     try:
-        conn = get_db_connection()
-        if not conn:
-            return False
-        
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO events (event_type, description)
-            VALUES (%s, %s)
-            RETURNING id
-        ''', (event_type, description))
-        
-        event_id = cursor.fetchone()[0]
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(prepare_once(conn, cursor, 'ins_event'),
+                           (event_type, description))
+            
+            event_id = cursor.fetchone()[0]
+            conn.commit()
+            cursor.close()
         
-        print(f"📝 Evento guardado (ID:{event_id}) - {event_type}: {description}")
+        log.info("📝 Evento guardado (ID:%s) - %s: %s", event_id, event_type, description)
         return True
         
     except Exception as e:
-        print(f"❌ Error guardando evento: {e}")
+        log.error("❌ Error guardando evento: %s", e)
         return False
 
 # ==================== MQTT CALLBACKS ====================
@@ -501,7 +820,7 @@ def on_connect(client, userdata, flags, rc):
     
     Acciones:
         1. Suscribe a todos los feeds configurados
-        2. Registra evento de conexión en BD
+        2. Encola el evento de conexión (lo guarda writer_loop)
         3. Maneja reintentos si falla
     """
     global reconnect_count
@@ -510,13 +829,15 @@ def on_connect(client, userdata, flags, rc):
         print("✅ Conectado a Adafruit IO")
         reconnect_count = 0
         
-        # Suscribirse a todos los feeds
+        # Suscribirse a todos los feeds en un solo SUBSCRIBE (un solo SUBACK)
+        # QoS 0: telemetría no crítica, sin PUBACK por mensaje
+        client.subscribe([(f"{ADAFRUIT_USERNAME}/feeds/{feed_name}", MQTT_QOS)
+                          for feed_name in FEEDS.values()])
         for feed_name in FEEDS.values():
-            topic = f"{ADAFRUIT_USERNAME}/feeds/{feed_name}"
-            client.subscribe(topic)
             print(f"   📡 Suscrito a: {feed_name}")
         
-        save_event("MQTT_BRIDGE", "Conectado a Adafruit IO - V3 con manejo de anomalías")
+        # Por la cola: el hilo de red de paho nunca espera a PostgreSQL
+        enqueue_write('event', ("MQTT_BRIDGE", "Conectado a Adafruit IO - V3 con manejo de anomalías"))
         
     else:
         # Mapeo de códigos de error
@@ -547,11 +868,154 @@ def on_disconnect(client, userdata, rc):
     """
     if rc != 0:
         print(f"⚠️  Desconectado inesperadamente (rc: {rc})")
-        save_event("MQTT_BRIDGE", f"Desconexión inesperada (código: {rc})")
+        enqueue_write('event', ("MQTT_BRIDGE", f"Desconexión inesperada (código: {rc})"))
         time.sleep(10)
     else:
         print(f"✅ Desconectado correctamente")
 
+### HANDLERS POR FEED ###
+# Un handler por feed: on_message hace una sola búsqueda en HANDLERS
+
+def _parse_dht(value):
+    """Temperatura/humedad: float, o ANOMALIA si el sensor falló"""
+    # Validar antes de convertir: durante una falla del sensor cada lectura
+    # es inválida, y float() lanzaría una excepción por mensaje
+    if DHT_RE.fullmatch(value):
+        return float(value)
+    return ANOMALIA
+
+### DETECCIÓN DE VALORES ATÍPICOS (Z-SCORE) ###
+# Un pico aislado del DHT22 (|z| > ZSCORE_LIMIT frente a las últimas
+# ZSCORE_WINDOW muestras) se guarda como ANOMALIA; si se repite
+# ZSCORE_PERSIST veces seguidas se acepta como cambio real
+ZSCORE_WINDOW = 300
+ZSCORE_MIN_SAMPLES = 30  # Sin historia suficiente no se descarta nada
+ZSCORE_LIMIT = 4.0
+ZSCORE_PERSIST = 3
+# Desviación mínima por métrica: el DHT22 cuantiza a 0.1 y con datos casi
+# planos la desviación real tiende a 0, así un cambio normal de 0.1-0.3
+# daría |z| enorme. Con el piso, solo saltos de más de ~LIMIT*MIN_STD cuentan
+ZSCORE_MIN_STD_TEMP = 0.5  # °C
+ZSCORE_MIN_STD_HUM = 2.0   # %RH
+outliers_discarded = 0   # Se reporta y reinicia con el dashboard
+
+class RollingZScore:
+    """
+    Media y desviación de una ventana deslizante con el método de Welford
+    (actualización incremental al entrar y salir cada muestra: O(1) y sin
+    la cancelación numérica de sum(x²)/n - media²)
+    """
+    __slots__ = ('window', 'mean', 'm2', 'min_std', 'streak')
+    
+    def __init__(self, min_std, size=ZSCORE_WINDOW):
+        self.window = deque(maxlen=size)
+        self.mean = 0.0
+        self.m2 = 0.0        # Suma de cuadrados de las desviaciones a la media
+        self.min_std = min_std
+        self.streak = 0  # Atípicos consecutivos
+    
+    def zscore(self, x):
+        n = len(self.window)
+        if n < ZSCORE_MIN_SAMPLES:
+            return 0.0
+        std = max(math.sqrt(max(self.m2 / n, 0.0)), self.min_std)
+        return (x - self.mean) / std
+    
+    def add(self, x):
+        window = self.window
+        if len(window) == window.maxlen:
+            # Welford inverso: quitar la muestra más antigua
+            old = window.popleft()
+            n = len(window)
+            if n == 0:
+                self.mean = self.m2 = 0.0
+            else:
+                delta = old - self.mean
+                self.mean -= delta / n
+                self.m2 -= delta * (old - self.mean)
+        window.append(x)
+        delta = x - self.mean
+        self.mean += delta / len(window)
+        self.m2 += delta * (x - self.mean)
+    
+    def check(self, x):
+        """Retorna x si es plausible, ANOMALIA si es un pico aislado"""
+        global outliers_discarded
+        if abs(self.zscore(x)) > ZSCORE_LIMIT:
+            self.streak += 1
+            if self.streak < ZSCORE_PERSIST:
+                outliers_discarded += 1
+                return ANOMALIA
+        else:
+            self.streak = 0
+        self.add(x)
+        return x
+
+_zscore = {
+    'temperature': RollingZScore(ZSCORE_MIN_STD_TEMP),
+    'humidity': RollingZScore(ZSCORE_MIN_STD_HUM),
+}
+
+def _mark_partial():
+    """Marca el inicio de una lectura parcial (lo mide check_buffer_timeout)"""
+    if data_buffer.last_update is None:
+        data_buffer.last_update = time.monotonic()  # No salta con NTP
+
+def _set_temperature(value):
+    value = _parse_dht(value)
+    if value is not ANOMALIA:
+        value = _zscore['temperature'].check(value)
+    data_buffer.temperature = value
+    _mark_partial()
+
+def _set_humidity(value):
+    value = _parse_dht(value)
+    if value is not ANOMALIA:
+        value = _zscore['humidity'].check(value)
+    data_buffer.humidity = value
+    _mark_partial()
+
+def _set_ldr_percent(value):
+    data_buffer.ldr_percent = float(value)
+    _mark_partial()
+
+def _set_ldr_raw(value):
+    data_buffer.ldr_raw = int(value)
+    _mark_partial()
+
+def _set_comfort(value):
+    data_buffer.comfort = value
+    _mark_partial()
+
+def _h_estado(value):
+    """Timestamp: cierra la lectura y la pasa a la cola de escritura"""
+    global reading_counter
+    data_buffer.estado = value
+    reading_counter += 1
+    flush_buffer_to_db()  # Conjunto completo a la cola de escritura
+
+def _h_stats(value):
+    enqueue_write('stats', value)
+
+def _h_event(value):
+    # Una sola pasada: sep vacío si no hay tipo de evento
+    event_type, sep, description = value.partition(':')
+    if sep:
+        enqueue_write('event', (event_type, description))
+    else:
+        enqueue_write('event', ("SYSTEM", value))
+
+HANDLERS = {
+    FEEDS['temperature']: _set_temperature,
+    FEEDS['humidity']: _set_humidity,
+    FEEDS['ldr_percent']: _set_ldr_percent,
+    FEEDS['ldr_raw']: _set_ldr_raw,
+    FEEDS['comfort']: _set_comfort,
+    FEEDS['estado']: _h_estado,
+    FEEDS['stats']: _h_stats,
+    FEEDS['system_event']: _h_event,
+}
+
 def on_message(client, userdata, msg):
     """
     Callback ejecutado al recibir mensaje MQTT
@@ -559,77 +1023,33 @@ def on_message(client, userdata, msg):
     Proceso:
         1. Parsea el feed y valor recibido
         2. Acumula datos en buffer
-        3. Al recibir 'estado' (timestamp), activa flush a BD
-        4. Maneja feeds especiales (stats, events)
+        3. Al recibir 'estado' (timestamp), encola la lectura completa
+        4. Encola feeds especiales (stats, events)
+    
+    No accede a la BD: writer_loop hace todas las escrituras
     
     Args:
         msg: Objeto mensaje MQTT con topic y payload
     """
-    global data_buffer, reading_counter
-    
     try:
         feed_name = msg.topic.split('/')[-1]
         value = msg.payload.decode('utf-8')
         
-        print(f"📥 MQTT → {feed_name}: {value}")
+        log.debug("📥 MQTT → %s: %s", feed_name, value)
         
-        ### TEMPERATURA ###
-        if feed_name == FEEDS['temperature']:
-            if value == ANOMALIA or value == "N/A":
-                data_buffer['temperature'] = ANOMALIA
-            else:
-                try:
-                    data_buffer['temperature'] = float(value)
-                except:
-                    data_buffer['temperature'] = ANOMALIA
-            
-        ### HUMEDAD ###
-        elif feed_name == FEEDS['humidity']:
-            if value == ANOMALIA or value == "N/A":
-                data_buffer['humidity'] = ANOMALIA
-            else:
-                try:
-                    data_buffer['humidity'] = float(value)
-                except:
-                    data_buffer['humidity'] = ANOMALIA
-            
-        ### LUMINOSIDAD (PORCENTAJE) ###
-        elif feed_name == FEEDS['ldr_percent']:
-            data_buffer['ldr_percent'] = float(value)
-            
-        ### LUMINOSIDAD (RAW) ###
-        elif feed_name == FEEDS['ldr_raw']:
-            data_buffer['ldr_raw'] = int(value)
-            
-        ### CONFORT TÉRMICO ###
-        elif feed_name == FEEDS['comfort']:
-            data_buffer['comfort'] = value
-            
-        ### TIMESTAMP (TRIGGER DE GUARDADO) ###
-        elif feed_name == FEEDS['estado']:
-            data_buffer['estado'] = value
-            data_buffer['last_update'] = time.time()
-            reading_counter += 1
-            flush_buffer_to_db()  # Guardar conjunto completo
-            
-        ### ESTADÍSTICAS ###
-        elif feed_name == FEEDS['stats']:
-            save_statistics(value)
-            
-        ### EVENTOS DEL SISTEMA ###
-        elif feed_name == FEEDS['system_event']:
-            if ':' in value:
-                event_type, description = value.split(':', 1)
-                save_event(event_type, description)
-            else:
-                save_event("SYSTEM", value)
+        ### TABLA DE DESPACHO ###
+        # Un handler por feed; 'estado' dispara el guardado de la lectura
+        handler = HANDLERS.get(feed_name)
+        if handler is not None:
+            with _buffer_lock:
+                handler(value)
         
     except Exception as e:
-        print(f"❌ Error procesando mensaje: {e}")
+        log.error("❌ Error procesando mensaje: %s", e)
 
 def flush_buffer_to_db():
     """
-    Guarda el buffer acumulado en la base de datos
+    Pasa el buffer acumulado a la cola de escritura (ver writer_loop)
     
     Condiciones:
         - Requiere al menos: ldr_percent, ldr_raw, estado
@@ -638,34 +1058,37 @@ def flush_buffer_to_db():
     Después de guardar:
         - Limpia el buffer para nueva lectura
     """
-    global data_buffer, reading_counter
+    global reading_counter, _last_hash, _last_hash_ts, duplicates_skipped
     
     # Verificar que tenemos datos mínimos necesarios
-    if (data_buffer['ldr_percent'] is not None and 
-        data_buffer['ldr_raw'] is not None and 
-        data_buffer['estado'] is not None):
+    if (data_buffer.ldr_percent is not None and 
+        data_buffer.ldr_raw is not None and 
+        data_buffer.estado is not None):
+        
+        ### DESCARTAR REENVÍOS ###
+        h = hash((data_buffer.temperature, data_buffer.humidity,
+                  data_buffer.ldr_raw, data_buffer.estado))
+        now = time.monotonic()
+        if h == _last_hash and now - _last_hash_ts < DEDUP_WINDOW:
+            duplicates_skipped += 1
+            reading_counter -= 1  # El reenvío no consume número de lectura
+            data_buffer.reset()
+            return
         
-        success = save_sensor_reading(
-            data_buffer['temperature'],
-            data_buffer['humidity'],
-            data_buffer['ldr_percent'],
-            data_buffer['ldr_raw'],
-            data_buffer['estado'],
-            data_buffer.get('comfort'),
+        enqueue_write('sensor', build_sensor_row(
+            data_buffer.temperature,
+            data_buffer.humidity,
+            data_buffer.ldr_percent,
+            data_buffer.ldr_raw,
+            data_buffer.estado,
+            data_buffer.comfort,
             reading_counter
-        )
+        ))
         
-        # Limpiar buffer después de guardado exitoso
-        if success:
-            data_buffer = {
-                'temperature': None,
-                'humidity': None,
-                'ldr_percent': None,
-                'ldr_raw': None,
-                'estado': None,
-                'comfort': None,
-                'last_update': None
-            }
+        # Limpiar buffer: la lectura ya quedó en la cola de escritura
+        _last_hash = h
+        _last_hash_ts = now
+        data_buffer.reset()
 
 def check_buffer_timeout():
     """
@@ -677,36 +1100,96 @@ def check_buffer_timeout():
     
     Previene pérdida de datos en caso de feeds incompletos
     """
-    global data_buffer
-    
-    if data_buffer['last_update'] is not None:
-        elapsed = time.time() - data_buffer['last_update']
+    last_update = data_buffer.last_update
+    if last_update is not None:
+        elapsed = time.monotonic() - last_update
         
         if elapsed > BUFFER_TIMEOUT:
-            print(f"⚠️  Buffer timeout ({elapsed:.1f}s) - guardando datos parciales")
+            log.warning("⚠️  Buffer timeout (%.1fs) - guardando datos parciales", elapsed)
             
             # Guardar con valores por defecto para campos faltantes
-            if data_buffer['ldr_percent'] is not None:
-                save_sensor_reading(
-                    data_buffer['temperature'],
-                    data_buffer['humidity'],
-                    data_buffer['ldr_percent'],
-                    data_buffer.get('ldr_raw', 0),
-                    data_buffer.get('estado', 'UNKNOWN'),
-                    data_buffer.get('comfort'),
+            if data_buffer.ldr_percent is not None:
+                enqueue_write('sensor', build_sensor_row(
+                    data_buffer.temperature,
+                    data_buffer.humidity,
+                    data_buffer.ldr_percent,
+                    data_buffer.ldr_raw if data_buffer.ldr_raw is not None else 0,
+                    data_buffer.estado or 'UNKNOWN',
+                    data_buffer.comfort,
                     reading_counter
+                ))
+            
+            # Limpiar buffer (sin ldr_percent la lectura parcial se descarta);
+            # si no, el timeout se repetiría cada segundo hasta el próximo 'estado'
+            data_buffer.reset()
+
+def fetch_dashboard():
+    """
+    Consulta los datos del dashboard en un solo viaje a BD
+    
+    Returns:
+        tuple: (total, temp_anomalias, hum_anomalias, últimas 5, distribución de confort)
+    """
+    # Anomalías desde los índices parciales; últimas 5 y confort como arrays JSON
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute('''
+                WITH totals AS (
+                    SELECT (SELECT COUNT(*) FROM sensor_readings) AS total,
+                           (SELECT COUNT(*) FROM sensor_readings
+                            WHERE temperature IS NULL) AS temp_anomalias,
+                           (SELECT COUNT(*) FROM sensor_readings
+                            WHERE humidity IS NULL) AS hum_anomalias
+                ),
+                recent AS (
+                    SELECT timestamp, temperature, humidity, ldr_percent,
+                           estado, comfort_level
+                    FROM sensor_readings
+                    ORDER BY timestamp DESC
+                    LIMIT 5
+                ),
+                comfort AS (
+                    SELECT comfort_level, COUNT(*) AS count
+                    FROM sensor_readings
+                    WHERE comfort_level IS NOT NULL
+                    GROUP BY comfort_level
                 )
-                
-                # Limpiar buffer
-                data_buffer = {
-                    'temperature': None,
-                    'humidity': None,
-                    'ldr_percent': None,
-                    'ldr_raw': None,
-                    'estado': None,
-                    'comfort': None,
-                    'last_update': None
-                }
+                SELECT totals.total, totals.temp_anomalias, totals.hum_anomalias,
+                       (SELECT json_agg(json_build_array(
+                                   to_char(timestamp, 'HH24:MI:SS'), temperature, humidity,
+                                   ldr_percent, estado, comfort_level)
+                               ORDER BY timestamp DESC)
+                        FROM recent),
+                       (SELECT json_agg(json_build_array(comfort_level, count)
+                               ORDER BY count DESC)
+                        FROM comfort)
+                FROM totals
+            ''')
+            return cursor.fetchone()
+
+def get_dashboard():
+    """
+    Datos del dashboard desde _DASH_CACHE si no hubo inserciones desde la
+    última consulta; si no, ejecuta fetch_dashboard()
+    
+    Returns:
+        tuple: mismo formato que fetch_dashboard()
+    """
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            # Lectura de una fila: mucho más barata que COUNT/GROUP BY
+            cursor.execute("SELECT last_value, is_called FROM sensor_readings_id_seq")
+            key = cursor.fetchone()
+    
+    now = time.monotonic()
+    if key == _DASH_CACHE["key"] and now - _DASH_CACHE["ts"] < DASHBOARD_CACHE_TTL:
+        return _DASH_CACHE["data"]
+    
+    # key se leyó antes de la consulta: una inserción intermedia solo provoca
+    # otra consulta completa la próxima vez, nunca datos viejos
+    data = fetch_dashboard()
+    _DASH_CACHE.update(ts=now, key=key, data=data)
+    return data
 
 def print_dashboard():
     """
@@ -723,67 +1206,32 @@ def print_dashboard():
     print("="*60)
     
     try:
-        conn = get_db_connection()
-        if not conn:
-            return
-        
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        total, temp_anomalias, hum_anomalias, recent, comfort_dist = get_dashboard()
         
         ### TOTAL DE LECTURAS ###
-        cursor.execute("SELECT COUNT(*) as total FROM sensor_readings")
-        total = cursor.fetchone()['total']
         print(f"\n📈 Total de lecturas: {total}")
         
         ### ÚLTIMAS 5 LECTURAS ###
-        cursor.execute('''
-            SELECT timestamp, temperature, humidity, ldr_percent, 
-                   estado, comfort_level
-            FROM sensor_readings
-            ORDER BY timestamp DESC
-            LIMIT 5
-        ''')
-        recent = cursor.fetchall()
-        
-        print("\n🕐 Últimas 5 lecturas:")
-        for r in recent:
-            ts = r['timestamp'].strftime("%H:%M:%S")
-            comfort = r['comfort_level'] or 'N/A'
-            temp_str = f"{r['temperature']}°C" if r['temperature'] is not None else ANOMALIA
-            hum_str = f"{r['humidity']}%" if r['humidity'] is not None else ANOMALIA
-            print(f"  {ts} - T:{temp_str} H:{hum_str} "
-                  f"LDR:{r['ldr_percent']}% {r['estado']} [{comfort}]")
+        if recent:
+            print("\n🕐 Últimas 5 lecturas:")
+            for ts, temperature, humidity, ldr_percent, estado, comfort_level in recent:
+                comfort = comfort_level or 'N/A'
+                temp_str = f"{temperature}°C" if temperature is not None else ANOMALIA
+                hum_str = f"{humidity}%" if humidity is not None else ANOMALIA
+                print(f"  {ts} - T:{temp_str} H:{hum_str} "
+                      f"LDR:{ldr_percent}% {estado} [{comfort}]")
         
         ### DISTRIBUCIÓN DE CONFORT ###
-        cursor.execute('''
-            SELECT comfort_level, COUNT(*) as count
-            FROM sensor_readings
-            WHERE comfort_level IS NOT NULL
-            GROUP BY comfort_level
-            ORDER BY count DESC
-        ''')
-        comfort_dist = cursor.fetchall()
-        
         if comfort_dist:
             print("\n🌡️  Distribución de confort:")
-            for c in comfort_dist:
-                print(f"  {c['comfort_level']}: {c['count']} lecturas")
+            for comfort_level, count in comfort_dist:
+                print(f"  {comfort_level}: {count} lecturas")
         
         ### ESTADÍSTICAS DE ANOMALÍAS ###
-        cursor.execute('''
-            SELECT 
-                COUNT(*) FILTER (WHERE temperature IS NULL) as temp_anomalias,
-                COUNT(*) FILTER (WHERE humidity IS NULL) as hum_anomalias
-            FROM sensor_readings
-        ''')
-        anomalias = cursor.fetchone()
-        
-        if anomalias['temp_anomalias'] > 0 or anomalias['hum_anomalias'] > 0:
+        if temp_anomalias > 0 or hum_anomalias > 0:
             print(f"\n⚠️  Anomalías detectadas:")
-            print(f"  • Temperatura: {anomalias['temp_anomalias']} lecturas")
-            print(f"  • Humedad: {anomalias['hum_anomalias']} lecturas")
-        
-        cursor.close()
-        conn.close()
+            print(f"  • Temperatura: {temp_anomalias} lecturas")
+            print(f"  • Humedad: {hum_anomalias} lecturas")
         
     except Exception as e:
         print(f"❌ Error generando dashboard: {e}")
@@ -829,6 +1277,10 @@ def main():
     # Configurar reconexión automática
     client.reconnect_delay_set(min_delay=1, max_delay=120)
     
+    # Escrituras a BD fuera del hilo de red de paho
+    writer = threading.Thread(target=writer_loop, daemon=True)
+    writer.start()
+    
     # Conectar
     print(f"\n[3] Conectando a {ADAFRUIT_HOST}:{ADAFRUIT_PORT}...")
     try:
@@ -842,7 +1294,8 @@ def main():
     print("="*60)
     print("\n⏳ Esperando datos de Wokwi...\n")
     
-    last_dashboard = time.time()
+    global duplicates_skipped, outliers_discarded
+    last_dashboard = time.monotonic()
     
     try:
         # Iniciar loop en segundo plano
@@ -851,64 +1304,36 @@ def main():
         while True:
             time.sleep(1)
             
+            # Lecturas parciales que nunca recibieron 'estado'
+            with _buffer_lock:
+                check_buffer_timeout()
+            
             # Dashboard cada 5 minutos
-            if time.time() - last_dashboard > 300:
+            now = time.monotonic()
+            if now - last_dashboard > 300:
                 print_dashboard()
-                last_dashboard = time.time()
+                if duplicates_skipped:
+                    print(f"🔁 {duplicates_skipped} lecturas duplicadas descartadas (últimos 5 min)")
+                    duplicates_skipped = 0
+                if outliers_discarded:
+                    print(f"📉 {outliers_discarded} valores atípicos (z > {ZSCORE_LIMIT}) guardados como {ANOMALIA}")
+                    outliers_discarded = 0
+                last_dashboard = now
                 
     except KeyboardInterrupt:
         print("\n\n⏹️  Detenido por usuario")
         client.loop_stop()
         client.disconnect()
+        try:
+            # writer_loop guarda el lote pendiente y termina
+            write_queue.put(_STOP, timeout=5)
+            writer.join(timeout=10)
+        except queue.Full:
+            # BD caída con la cola llena: writer_loop no la está vaciando
+            log.warning("⚠️  BD sin responder - %d lecturas sin guardar", len(pending_rows))
         save_event("MQTT_BRIDGE", "Bridge detenido por usuario")
         print("✅ Desconectado limpiamente")
 
-def print_dashboard():
-    """Dashboard de estadísticas"""
-    print("\n" + "="*60)
-    print(" 📊 DASHBOARD")
-    print("="*60)
-    
-    try:
-        conn = get_db_connection()
-        if not conn:
-            return
-        
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
-        # Total de lecturas
-        cursor.execute("SELECT COUNT(*) as total FROM sensor_readings")
-        total = cursor.fetchone()['total']
-        print(f"\n📈 Total de lecturas: {total}")
-        
-        # Últimas 5 lecturas
-        cursor.execute('''
-            SELECT timestamp, temperature, humidity, ldr_percent, 
-                   estado, comfort_level
-            FROM sensor_readings
-            ORDER BY timestamp DESC
-            LIMIT 5
-        ''')
-        recent = cursor.fetchall()
-        
-        if recent:
-            print("\n🕐 Últimas 5 lecturas:")
-            for r in recent:
-                ts = r['timestamp'].strftime("%H:%M:%S")
-                comfort = r['comfort_level'] or 'N/A'
-                temp_str = f"{r['temperature']}°C" if r['temperature'] is not None else ANOMALIA
-                hum_str = f"{r['humidity']}%" if r['humidity'] is not None else ANOMALIA
-                print(f"  {ts} - T:{temp_str} H:{hum_str} "
-                      f"LDR:{r['ldr_percent']}% {r['estado']} [{comfort}]")
-        
-        cursor.close()
-        conn.close()
-        
-    except Exception as e:
-        print(f"❌ Error generando dashboard: {e}")
-    
-    print("="*60 + "\n")
-
 # ==================== ENTRY POINT ====================
 
 if __name__ == "__main__":
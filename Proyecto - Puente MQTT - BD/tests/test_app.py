@@ -0,0 +1,77 @@
+# test_app.py
+# Pruebas de los helpers puros del backend HTTP (app.py)
+
+import pytest
+
+import app
+
+
+# ==================== parse_id_range ====================
+
+def test_parse_id_range_rango():
+    assert app.parse_id_range('512:561') == (512, 561)
+
+
+def test_parse_id_range_un_solo_id():
+    assert app.parse_id_range('42') == (42, 42)
+
+
+@pytest.mark.parametrize('payload', ['', None])
+def test_parse_id_range_vacio(payload):
+    # Una sentencia sin filas notifica un payload vacío
+    assert app.parse_id_range(payload) is None
+
+
+# ==================== parse_sensor_row ====================
+
+def test_parse_sensor_row_valida():
+    row = app.parse_sensor_row({
+        'temperature': 20.7,
+        'humidity': 40.0,
+        'ldr_percent': 24.4,
+        'ldr_raw': 16003,
+        'estado': 'NOCHE',
+    })
+    assert row == (20.7, 40.0, 24.4, 16003, 'NOCHE')
+
+
+@pytest.mark.parametrize('valor', ['N/A', 'ANOMALIA', None])
+def test_parse_sensor_row_sin_lectura_es_null(valor):
+    row = app.parse_sensor_row({
+        'temperature': valor,
+        'humidity': valor,
+        'ldr_percent': 10,
+        'ldr_raw': 1,
+    })
+    assert row == (None, None, 10.0, 1, 'UNKNOWN')
+
+
+def test_parse_sensor_row_acepta_numeros_como_texto():
+    row = app.parse_sensor_row({
+        'temperature': '21.5',
+        'ldr_percent': '50',
+        'ldr_raw': '123',
+        'estado': 7,
+    })
+    assert row == (21.5, None, 50.0, 123, '7')
+
+
+@pytest.mark.parametrize('data', [
+    {'ldr_raw': 1},
+    {'ldr_percent': 1.0},
+    {'ldr_percent': None, 'ldr_raw': 1},
+])
+def test_parse_sensor_row_faltan_campos_ldr(data):
+    with pytest.raises(ValueError, match='ldr_percent and ldr_raw required'):
+        app.parse_sensor_row(data)
+
+
+def test_parse_sensor_row_valor_no_numerico():
+    with pytest.raises(ValueError, match='Invalid numeric value'):
+        app.parse_sensor_row({'temperature': 'abc', 'ldr_percent': 1, 'ldr_raw': 1})
+
+
+@pytest.mark.parametrize('data', [[1, 2], 'texto', 5])
+def test_parse_sensor_row_no_es_objeto(data):
+    with pytest.raises(ValueError, match='JSON object'):
+        app.parse_sensor_row(data)
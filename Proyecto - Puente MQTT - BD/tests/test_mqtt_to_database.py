@@ -0,0 +1,169 @@
+# test_mqtt_to_database.py
+# Pruebas de los helpers puros del bridge MQTT → PostgreSQL
+
+import random
+import statistics
+import struct
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import mqtt_to_database as bridge
+
+
+# ==================== build_sensor_row ====================
+
+def test_build_sensor_row_convierte_anomalias_a_null():
+    row = bridge.build_sensor_row(bridge.ANOMALIA, 'N/A', 40.5, 1234, '10:05 AM')
+    assert row[:5] == (None, None, 40.5, 1234, '10:05 AM')
+
+
+def test_build_sensor_row_convierte_texto_numerico():
+    row = bridge.build_sensor_row('23.5', 'abc', 40.5, 1234, '10:05 AM', 'Confortable', 7)
+    assert row[:7] == (23.5, None, 40.5, 1234, '10:05 AM', 'Confortable', 7)
+
+
+def test_build_sensor_row_hora_utc_sin_zona():
+    antes = datetime.now(timezone.utc).replace(tzinfo=None)
+    ts = bridge.build_sensor_row(20.0, 50.0, 1.0, 1, 'x')[7]
+    despues = datetime.now(timezone.utc).replace(tzinfo=None)
+    # Columna TIMESTAMP sin zona: el valor debe ser naive y en UTC
+    assert ts.tzinfo is None
+    assert antes <= ts <= despues
+
+
+# ==================== COPY binario ====================
+
+class _CopyCursor:
+    """Cursor falso: guarda lo que copy_sensor_rows envía a COPY"""
+
+    def copy_expert(self, sql, buf):
+        self.sql = sql
+        self.data = buf.read()
+
+
+def _decode_pgcopy(data):
+    """Decodifica el formato binario de COPY generado por copy_sensor_rows"""
+    assert data[:11] == b'PGCOPY\n\xff\r\n\x00'
+    flags, ext = struct.unpack_from('!ii', data, 11)
+    assert (flags, ext) == (0, 0)
+    pos = 19
+    rows = []
+    while True:
+        (nfields,) = struct.unpack_from('!h', data, pos)
+        pos += 2
+        if nfields == -1:
+            break
+        fields = []
+        for _ in range(nfields):
+            (length,) = struct.unpack_from('!i', data, pos)
+            pos += 4
+            if length == -1:
+                fields.append(None)
+            else:
+                fields.append(data[pos:pos + length])
+                pos += length
+        rows.append(fields)
+    assert pos == len(data)
+    return rows
+
+
+def test_copy_sensor_rows_binario():
+    ts = datetime(2026, 10, 14, 4, 58, 54, 184729)
+    rows = [
+        (23.5, 55.25, 40.5, 1234, '10:05 AM', 'Confortable', 7, ts),
+        (None, None, 0.0, 0, 'ñandú €', None, None, datetime(2000, 1, 1)),
+    ]
+    cursor = _CopyCursor()
+    bridge.copy_sensor_rows(cursor, rows)
+    assert 'FORMAT binary' in cursor.sql
+
+    decoded = _decode_pgcopy(cursor.data)
+    assert len(decoded) == 2
+
+    temp, hum, ldr_pct, ldr_raw, estado, comfort, number, raw_ts = decoded[0]
+    assert struct.unpack('!f', temp)[0] == pytest.approx(23.5)
+    assert struct.unpack('!f', hum)[0] == pytest.approx(55.25)
+    assert struct.unpack('!f', ldr_pct)[0] == pytest.approx(40.5)
+    assert struct.unpack('!i', ldr_raw)[0] == 1234
+    assert estado.decode('utf-8') == '10:05 AM'
+    assert comfort.decode('utf-8') == 'Confortable'
+    assert struct.unpack('!i', number)[0] == 7
+    micros = struct.unpack('!q', raw_ts)[0]
+    assert datetime(2000, 1, 1) + timedelta(microseconds=micros) == ts
+
+    temp, hum, _, _, estado, comfort, number, raw_ts = decoded[1]
+    assert (temp, hum, comfort, number) == (None, None, None, None)
+    assert estado.decode('utf-8') == 'ñandú €'
+    assert struct.unpack('!q', raw_ts)[0] == 0
+
+
+# ==================== RollingZScore ====================
+
+def test_rolling_zscore_coincide_con_statistics():
+    z = bridge.RollingZScore(0.0, size=50)
+    random.seed(1)
+    xs = [1000 + random.gauss(0, 0.3) for _ in range(400)]
+    for x in xs:
+        z.add(x)
+    ventana = xs[-50:]
+    assert z.mean == pytest.approx(statistics.fmean(ventana), abs=1e-9)
+    assert z.m2 / 50 == pytest.approx(statistics.pvariance(ventana), abs=1e-9)
+
+
+def test_rolling_zscore_sin_historia_no_descarta():
+    z = bridge.RollingZScore(bridge.ZSCORE_MIN_STD_TEMP)
+    for _ in range(bridge.ZSCORE_MIN_SAMPLES - 1):
+        z.add(24.0)
+    assert z.zscore(100.0) == 0.0
+
+
+def test_rolling_zscore_piso_de_desviacion():
+    # Datos casi planos: pasos normales del DHT22 no se marcan como atípicos
+    z = bridge.RollingZScore(bridge.ZSCORE_MIN_STD_TEMP)
+    for i in range(200):
+        z.check(24.0 if i % 10 else 24.1)
+    assert [z.check(v) for v in (24.2, 24.4, 24.7)] == [24.2, 24.4, 24.7]
+    assert z.check(30.0) == bridge.ANOMALIA
+
+
+def test_rolling_zscore_acepta_cambio_persistente():
+    z = bridge.RollingZScore(bridge.ZSCORE_MIN_STD_TEMP)
+    for _ in range(100):
+        z.check(20.0)
+    resultados = [z.check(35.0) for _ in range(bridge.ZSCORE_PERSIST)]
+    assert resultados[:-1] == [bridge.ANOMALIA] * (bridge.ZSCORE_PERSIST - 1)
+    assert resultados[-1] == 35.0
+
+
+# ==================== STATS_RE / DHT_RE ====================
+
+def test_stats_re_extrae_las_tres_metricas():
+    data = 'T:25.3(18.5-32.1) H:65.2(45.0-85.0) L:55.8(10.2-95.3)'
+    parsed = {m.group(1): tuple(map(float, m.groups()[1:]))
+              for m in bridge.STATS_RE.finditer(data)}
+    assert parsed == {
+        'T': (25.3, 18.5, 32.1),
+        'H': (65.2, 45.0, 85.0),
+        'L': (55.8, 10.2, 95.3),
+    }
+
+
+def test_stats_re_admite_negativos_y_metricas_ausentes():
+    parsed = {m.group(1): tuple(map(float, m.groups()[1:]))
+              for m in bridge.STATS_RE.finditer('T:-2.5(-8.0-3.1) L:5(0-10)')}
+    assert parsed == {'T': (-2.5, -8.0, 3.1), 'L': (5.0, 0.0, 10.0)}
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('23.5', 23.5),
+    ('-4', -4.0),
+    ('0.0', 0.0),
+])
+def test_parse_dht_numeros(value, expected):
+    assert bridge._parse_dht(value) == expected
+
+
+@pytest.mark.parametrize('value', ['ANOMALIA', 'nan', '', '23.5C', '1e3', '23.'])
+def test_parse_dht_invalidos(value):
+    assert bridge._parse_dht(value) == bridge.ANOMALIA
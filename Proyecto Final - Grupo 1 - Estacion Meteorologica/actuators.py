@@ -77,6 +77,8 @@ class Buzzer:
         self.pin_num = pin
         self.pin = Pin(pin, Pin.OUT)
         self._pwm = None
+        self._timer = None  # Timer de play(), creado en el primer uso
+        self._tones = []    # Tonos pendientes de play()
 
     def on(self):
         """Activa el buzzer continuamente"""
@@ -133,4 +135,46 @@ class Buzzer:
             # Fallback para buzzers activos
             self.pin.value(1)
             utime.sleep_ms(int(ms))
-            self.pin.value(0)
\ No newline at end of file
+            self.pin.value(0)
+
+    def play(self, tones, volume=80):
+        """
+        Reproduce una secuencia de tonos sin bloquear el loop principal
+        Un Timer one-shot termina cada tono y arranca el siguiente
+        
+        Args:
+            tones (list): Tuplas (freq, ms); freq 0 es un silencio
+            volume (int): Volumen 0-100% (default: 80)
+        
+        Uso:
+            buzzer.play([(1500, 100), (0, 100), (2000, 100)])
+        """
+        from machine import Timer
+        
+        if self._timer is None:
+            self._timer = Timer(-1)
+        self._volume = volume
+        self._tones = list(tones)
+        self._next_tone(None)
+
+    def _next_tone(self, _timer):
+        """Callback del Timer: apaga el tono actual y programa el siguiente"""
+        self.off()
+        if not self._tones:
+            return
+        
+        freq, ms = self._tones.pop(0)
+        if freq:
+            try:
+                from machine import PWM
+                
+                duty = int(max(0, min(100, self._volume)) / 100.0 * 65535)
+                self._pwm = PWM(Pin(self.pin_num))
+                self._pwm.freq(int(freq))
+                self._pwm.duty_u16(duty)
+            except Exception:
+                # Fallback para buzzers activos
+                self.pin.value(1)
+        
+        self._timer.init(mode=self._timer.ONE_SHOT, period=int(ms),
+                         callback=self._next_tone)
\ No newline at end of file
@@ -4,6 +4,7 @@
 # ✨ MEJORAS: Intervalo 20s + Manejo de anomalías
 
 from machine import I2C, Pin
+from micropython import const
 import utime
 
 from sensors import LDR, DHT22Sensor
@@ -15,9 +16,11 @@ from utils import (
     obtener_temperatura_simulada,
     obtener_humedad_simulada,
     obtener_luminosidad_simulada,
+    TickSensores,
     calcular_confort_termico,
     descripcion_luminosidad,
-    MovingAverage
+    MovingAverage,
+    ANOMALIA
 )
 from mqtt_client import AdafruitMQTT
 
@@ -42,23 +45,28 @@ FEED_COMFORT = "sensor_comfort"        # Nivel de confort térmico
 
 # Cloud -> Dispositivo
 FEED_LED_COMMAND = "comando_led"       # Control remoto del LED
+COMMAND_FEEDS = (FEED_LED_COMMAND,)    # Feeds suscritos (un solo SUBSCRIBE)
 
 # Eventos del sistema
 FEED_SYSTEM_EVENT = "system_event"     # Log de eventos
 
 ### HARDWARE - CONFIGURACIÓN DE PINES ###
-I2C_SDA = 4  # Pin de datos I2C
-I2C_SCL = 5  # Pin de reloj I2C
+I2C_SDA = const(4)  # Pin de datos I2C
+I2C_SCL = const(5)  # Pin de reloj I2C
 
 ### TEMPORIZADORES ###
-SENSOR_INTERVAL = 10   # Lectura de sensores cada 10 segundos
-PUBLISH_INTERVAL = 20  # Publicación MQTT cada 20 segundos (optimizado)
+# const(): el compilador de MicroPython reemplaza cada uso por el valor
+SENSOR_INTERVAL = const(10)   # Lectura de sensores cada 10 segundos
+PUBLISH_INTERVAL = const(20)  # Publicación MQTT cada 20 segundos (optimizado)
+RECONNECT_INTERVAL = const(30)  # Reintento de conexión MQTT cada 30 segundos
 
 ### CONFIGURACIÓN LED ###
-LED_ON_MS = 200  # Duración del parpadeo al leer sensores
+LED_ON_MS = const(200)  # Duración del parpadeo al leer sensores
 
-### CONSTANTE PARA DATOS ANÓMALOS ###
-ANOMALIA = "ANOMALIA"  # Marcador cuando los sensores fallan
+### FEEDBACK DE PUBLICACIÓN ###
+# Escribir por serial bloquea el loop: resumen solo cada N publicaciones
+VERBOSE = False          # True: resumen y beep en cada publicación
+LOG_EVERY_PUBLISH = const(10)  # Publicaciones entre resúmenes (si VERBOSE=False)
 
 # ==================== INICIALIZACIÓN ====================
 
@@ -103,14 +111,23 @@ ma = MovingAverage(size=5)
 ### CLIENTE MQTT ###
 mqtt = AdafruitMQTT(ADAFRUIT_USERNAME, ADAFRUIT_KEY, WIFI_SSID, WIFI_PASSWORD)
 
+# Topics de publicación codificados una sola vez al arrancar
+for feed in (FEED_TEMPERATURE, FEED_HUMIDITY, FEED_LDR_PERCENT, FEED_LDR_RAW,
+             FEED_ESTADO, FEED_COMFORT, FEED_SYSTEM_EVENT):
+    mqtt.register_feed(feed)
+
 ### VARIABLES DE ESTADO ###
-last_sensor_read = 0    # Timestamp última lectura
-last_publish = 0        # Timestamp última publicación MQTT
+# Marcas en ms de utime.ticks_ms(): se comparan siempre con ticks_diff()
+# (seguro ante el desborde del contador). Se inicializan "en el pasado"
+# para que la primera lectura y el primer intento de conexión sean inmediatos
+last_sensor_read = utime.ticks_add(utime.ticks_ms(), -SENSOR_INTERVAL * 1000)  # Última lectura
+last_publish = utime.ticks_add(utime.ticks_ms(), -RECONNECT_INTERVAL * 1000)   # Última publicación MQTT
 last_temp = None        # Última temperatura leída
 last_hum = None         # Última humedad leída
 last_ldr_pct = None     # Último porcentaje de luminosidad
 mqtt_connected = False  # Estado de la conexión MQTT
 publish_counter = 0     # Contador de publicaciones exitosas
+last_sample = None      # Última tupla de read_sensors() (se publica tal cual)
 
 # ==================== FUNCIONES ====================
 
@@ -189,8 +206,8 @@ def connect_mqtt():
     display_message("Conectando", "Adafruit IO...")
     
     if mqtt.connect_mqtt():
-        # Suscribirse al feed de comandos
-        mqtt.subscribe(FEED_LED_COMMAND)
+        # Suscribirse a todos los feeds de comandos en un único paquete
+        mqtt.subscribe_many(COMMAND_FEEDS)
         mqtt.set_message_callback(on_cloud_message)
         mqtt_connected = True
         
@@ -223,16 +240,19 @@ def read_sensors():
     
     ### LECTURA DE SENSORES ###
     if MODO_SIMULACION:
-        # Datos simulados (ciclo de 24h comprimido en 5min)
-        temp = obtener_temperatura_simulada()
-        hum = obtener_humedad_simulada()
-        pct = obtener_luminosidad_simulada()
-        raw = int((pct / 100.0) * 65535) if pct else 0
+        # Datos simulados (ciclo de 24h comprimido en 5min), todos con la
+        # misma hora simulada
+        with TickSensores():
+            temp = obtener_temperatura_simulada()
+            hum = obtener_humedad_simulada()
+            pct = obtener_luminosidad_simulada()
+            hora = obtener_hora_actual()
+        raw = (int(pct * 10 + 0.5) * 65535) // 1000 if pct else 0  # Décimas de % → ADC
     else:
         # Sensores físicos
-        raw = ldr.read_raw()
-        pct = ldr.read_pct()
+        raw, pct, _ = ldr.sample()  # Una sola lectura ADC para raw y %
         temp, hum = dht.read()
+        hora = obtener_hora_actual()
     
     utime.sleep_ms(LED_ON_MS)
     led.off()
@@ -255,11 +275,7 @@ def read_sensors():
     
     ### CÁLCULOS DERIVADOS ###
     desc_luz = descripcion_luminosidad(pct_smoothed)
-    confort = calcular_confort_termico(
-        temp if temp != ANOMALIA else None,
-        hum if hum != ANOMALIA else None
-    )
-    hora = obtener_hora_actual()
+    confort = calcular_confort_termico(temp, hum)  # Ya maneja ANOMALIA
     
     # Actualizar cache de valores
     last_temp = temp
@@ -281,7 +297,7 @@ def publish_all_sensors(temp, hum, ldr_pct, ldr_raw, hora, confort, desc_luz):
     """
     Publica todas las lecturas a sus respectivos feeds MQTT
     Envía "ANOMALIA" cuando los sensores fallan
-    Incluye delays de 100ms entre publicaciones para estabilidad
+    Todas las publicaciones salen en un solo envío TCP (publish_many)
     
     Retorna: True si todas las publicaciones fueron exitosas
     """
@@ -291,46 +307,25 @@ def publish_all_sensors(temp, hum, ldr_pct, ldr_raw, hora, confort, desc_luz):
         return False
     
     try:
-        success = True
-        
         ### PUBLICACIÓN DE DATOS ###
-        # Temperatura
-        temp_value = temp if temp != ANOMALIA else ANOMALIA
-        if not mqtt.publish(FEED_TEMPERATURE, temp_value):
-            success = False
-        utime.sleep_ms(100)
-        
-        # Humedad
-        hum_value = hum if hum != ANOMALIA else ANOMALIA
-        if not mqtt.publish(FEED_HUMIDITY, hum_value):
-            success = False
-        utime.sleep_ms(100)
-        
-        # Luminosidad (porcentaje)
-        if not mqtt.publish(FEED_LDR_PERCENT, ldr_pct):
-            success = False
-        utime.sleep_ms(100)
-        
-        # Luminosidad (valor ADC raw)
-        if not mqtt.publish(FEED_LDR_RAW, ldr_raw):
-            success = False
-        utime.sleep_ms(100)
-        
-        # Timestamp
-        if not mqtt.publish(FEED_ESTADO, hora):
-            success = False
-        utime.sleep_ms(100)
-        
-        # Confort térmico
-        if not mqtt.publish(FEED_COMFORT, confort):
-            success = False
+        # Las seis lecturas en un solo envío TCP, sin pausas entre feeds
+        success = mqtt.publish_many([
+            (FEED_TEMPERATURE, temp, False),     # Temperatura (o ANOMALIA)
+            (FEED_HUMIDITY, hum, False),         # Humedad (o ANOMALIA)
+            (FEED_LDR_PERCENT, ldr_pct, False),  # Luminosidad (porcentaje)
+            (FEED_LDR_RAW, ldr_raw, False),      # Luminosidad (valor ADC raw)
+            (FEED_ESTADO, hora, False),          # Timestamp
+            (FEED_COMFORT, confort, False),      # Confort térmico
+        ])
         
         ### FEEDBACK ###
         if success:
             publish_counter += 1
-            print(f"[MQTT] ✓ Datos publicados #{publish_counter}")
-            print(f"       Hora: {hora} | Confort: {confort} | Luz: {desc_luz}")
-            buzzer.beep(50, 2500)
+            if VERBOSE or publish_counter % LOG_EVERY_PUBLISH == 0:
+                print(f"[MQTT] ✓ Datos publicados #{publish_counter}")
+                print(f"       Hora: {hora} | Confort: {confort} | Luz: {desc_luz}")
+            if VERBOSE:
+                buzzer.play([(2500, 50)])  # No bloquea el loop
         else:
             mqtt_connected = False
             print("[MQTT] ✗ Error publicando algunos datos")
@@ -346,9 +341,8 @@ def publish_all_sensors(temp, hum, ldr_pct, ldr_raw, hora, confort, desc_luz):
 
 ### INICIO DEL SISTEMA ###
 print("\n[Sistema] Iniciando bucle principal...")
-buzzer.beep(100, 1500)
-utime.sleep_ms(100)
-buzzer.beep(100, 2000)
+# Melodía de arranque en segundo plano: la conexión MQTT empieza de inmediato
+buzzer.play([(1500, 100), (0, 100), (2000, 100)])
 
 # Conexión inicial a MQTT
 connect_mqtt()
@@ -369,13 +363,15 @@ print(f"  - Comandos:     {FEED_LED_COMMAND}")
 print(f"  - Eventos:      {FEED_SYSTEM_EVENT}")
 
 ### LOOP INFINITO ###
+readable = False  # Hay datos MQTT pendientes (ver espera al final del loop)
+
 while True:
     try:
-        current_time = utime.time()
+        now = utime.ticks_ms()
         
         ### VERIFICACIÓN DE MENSAJES MQTT ###
         # Procesar comandos entrantes desde la nube
-        if mqtt_connected:
+        if mqtt_connected and readable:
             try:
                 if not mqtt.check_messages():
                     print("\n[MQTT] Reconectando...")
@@ -386,44 +382,36 @@ while True:
             except Exception as e:
                 print(f"[MQTT] Error: {e}")
                 mqtt_connected = False
-        else:
-            # Intentar reconexión cada 30 segundos
-            if current_time - last_publish > 30:
-                connect_mqtt()
+        elif not mqtt_connected and utime.ticks_diff(now, last_publish) > RECONNECT_INTERVAL * 1000:
+            # Intentar reconexión cada 30 segundos (solo si no hay conexión)
+            connect_mqtt()
         
         ### LECTURA PERIÓDICA DE SENSORES ###
         # Ejecuta cada SENSOR_INTERVAL segundos
-        if current_time - last_sensor_read >= SENSOR_INTERVAL:
-            temp, hum, pct, raw, hora, confort, desc_luz = read_sensors()
-            last_sensor_read = current_time
+        if utime.ticks_diff(now, last_sensor_read) >= SENSOR_INTERVAL * 1000:
+            last_sample = read_sensors()
+            last_sensor_read = now
         
         ### PUBLICACIÓN PERIÓDICA A MQTT ###
         # Ejecuta cada PUBLISH_INTERVAL segundos (20s optimizado)
-        if mqtt_connected and (current_time - last_publish >= PUBLISH_INTERVAL):
-            if last_temp is not None or last_ldr_pct is not None:
-                hora_actual = obtener_hora_actual()
-                
-                # Recalcular métricas con valores más recientes
-                temp_calc = last_temp if last_temp != ANOMALIA else None
-                hum_calc = last_hum if last_hum != ANOMALIA else None
-                confort_actual = calcular_confort_termico(temp_calc, hum_calc)
-                desc_luz_actual = descripcion_luminosidad(last_ldr_pct)
-                
-                # Obtener valor raw correcto según modo
-                if MODO_SIMULACION:
-                    raw_actual = int((last_ldr_pct / 100.0) * 65535) if last_ldr_pct else 0
-                else:
-                    raw_actual = ldr.read_raw()
-                
-                # Publicar conjunto completo de datos
-                publish_all_sensors(
-                    last_temp, last_hum, last_ldr_pct,
-                    raw_actual, hora_actual, confort_actual, desc_luz_actual
-                )
-            last_publish = current_time
+        if mqtt_connected and utime.ticks_diff(now, last_publish) >= PUBLISH_INTERVAL * 1000:
+            if last_sample is not None:
+                # Publicar la última lectura: hora, confort y luz ya se
+                # calcularon en read_sensors(), no se recalculan aquí
+                publish_all_sensors(*last_sample)
+            last_publish = now
         
-        # Pequeño delay para no saturar el CPU
-        utime.sleep_ms(100)
+        ### ESPERA HASTA EL PRÓXIMO EVENTO ###
+        # poll() sobre el socket MQTT en lugar de despertar cada 100 ms:
+        # el CPU queda libre hasta que llegue un comando o toque leer/publicar
+        if mqtt_connected:
+            now = utime.ticks_ms()
+            wait_ms = min(SENSOR_INTERVAL * 1000 - utime.ticks_diff(now, last_sensor_read),
+                          PUBLISH_INTERVAL * 1000 - utime.ticks_diff(now, last_publish))
+            readable = mqtt.wait_readable(max(0, wait_ms))
+        else:
+            # Sin conexión: pequeño delay entre intentos de reconexión
+            utime.sleep_ms(100)
         
     except KeyboardInterrupt:
         ### APAGADO LIMPIO ###
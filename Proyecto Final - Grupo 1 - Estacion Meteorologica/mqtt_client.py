@@ -10,6 +10,37 @@ try:
 except ImportError:
     import socket  # type: ignore
 
+try:
+    import uselect as select
+except ImportError:
+    import select  # type: ignore
+
+try:
+    import uerrno as errno
+except ImportError:
+    import errno  # type: ignore
+
+try:
+    from micropython import const
+except ImportError:
+    def const(x):  # type: ignore
+        return x
+
+# const(): el compilador de MicroPython reemplaza cada uso por el valor
+TX_BUF_SIZE = const(512)  # Bytes del buffer de envío (una ráfaga de publish_many)
+RX_BUF_SIZE = const(256)  # Bytes del buffer de recepción (topic + payload de un comando)
+MAX_MESSAGES_PER_CHECK = const(16)  # Paquetes máximos por check_messages()
+WIFI_POLL_MIN_MS = const(50)   # Primera espera al comprobar la conexión WiFi
+WIFI_POLL_MAX_MS = const(500)  # Espera máxima entre comprobaciones (backoff)
+SEND_RETRY_MS = const(10)      # Espera con el buffer TCP lleno antes de reintentar send()
+SEND_TIMEOUT_MS = const(2000)  # Tiempo máximo para terminar de enviar un buffer
+
+### TIPOS DE PAQUETE MQTT (FIXED HEADER) ###
+_CONNECT = const(0x10)
+_CONNECT_FLAGS = const(0xC2)  # user+password+clean session
+_PUBLISH = const(0x30)        # QoS0
+_SUBSCRIBE = const(0x82)      # SUBSCRIBE (flags reservados 0010)
+
 
 class AdafruitMQTT:
     """
@@ -50,6 +81,18 @@ class AdafruitMQTT:
         self.client_id = b"wokwi-" + str(utime.ticks_ms() & 0xFFFF).encode()
         
         self.sock = None
+        self._addr = None   # Dirección del broker (DNS resuelto una vez)
+        self.poller = None  # poll() sobre el socket, creado al conectar
+        self._topic_cache = {}  # feed → topic codificado (ver register_feed)
+        
+        # Buffer de envío reutilizable para PUBLISH (ver _write_publish)
+        self._tx_buf = bytearray(TX_BUF_SIZE)
+        self._tx_mv = memoryview(self._tx_buf)
+        
+        # Buffer de recepción reutilizable (ver _recv_exact)
+        self._rx_buf = bytearray(RX_BUF_SIZE)
+        self._rx_mv = memoryview(self._rx_buf)
+        self._readinto = None  # readinto (MicroPython) o recv_into (CPython)
         self.connected = False
         self.on_message_callback = None
 
@@ -84,14 +127,17 @@ class AdafruitMQTT:
         self.wlan.active(True)
         self.wlan.connect(ssid, password)
 
-        # Esperar conexión con timeout
-        start = utime.time()
+        # Esperar conexión con timeout y backoff exponencial: comprobaciones
+        # seguidas al principio, más espaciadas cuanto más tarda
+        start = utime.ticks_ms()
+        delay = WIFI_POLL_MIN_MS
         while not self.wlan.isconnected():
-            if utime.time() - start > timeout:
+            if utime.ticks_diff(utime.ticks_ms(), start) > timeout * 1000:
                 print("[WiFi] ✗ Tiempo de espera agotado")
                 return False
             print(".", end="")
-            utime.sleep(1)
+            utime.sleep_ms(delay)
+            delay = min(delay * 2, WIFI_POLL_MAX_MS)
 
         print("\n[WiFi] ✓ Conectado. IP:", self.wlan.ifconfig()[0])
         return True
@@ -119,6 +165,28 @@ class AdafruitMQTT:
                 break
         return bytes(enc)
 
+    def _write_varlen(self, buf, offset, length):
+        """
+        Escribe 'remaining length' directamente en buf (sin objetos nuevos)
+        Misma codificación de 7 bits que _encode_varlen
+        
+        Args:
+            buf: bytearray o memoryview de destino
+            offset: Posición donde escribir
+            length: Longitud a codificar
+        
+        Retorna: Posición siguiente al último byte escrito
+        """
+        while True:
+            digit = length & 0x7F
+            length >>= 7
+            if length > 0:
+                digit |= 0x80  # Bit de continuación
+            buf[offset] = digit
+            offset += 1
+            if length == 0:
+                return offset
+
     def _encode_str(self, s):
         """
         Codifica string en formato MQTT (longitud + datos)
@@ -133,6 +201,21 @@ class AdafruitMQTT:
             s = s.encode("utf-8")
         return bytes([len(s) >> 8, len(s) & 0xFF]) + s
 
+    def register_feed(self, feed_name):
+        """
+        Precalcula el topic de un feed ya codificado en formato MQTT
+        Los feeds son fijos: publish() no vuelve a formatear ni codificar
+        
+        Args:
+            feed_name: Nombre del feed (sin prefijo de usuario)
+        
+        Retorna: bytes con "usuario/feeds/feed" con longitud prefijada
+        """
+        topic = "{}/feeds/{}".format(self.username, feed_name)
+        var_header = self._encode_str(topic.encode("utf-8"))
+        self._topic_cache[feed_name] = var_header
+        return var_header
+
     # ==================== CONEXIÓN AL BROKER ====================
 
     def connect_mqtt(self):
@@ -152,21 +235,46 @@ class AdafruitMQTT:
             print("[MQTT] ✗ No hay WiFi, llama primero a connect_wifi()")
             return False
 
+        ### CERRAR SOCKET ANTERIOR ###
+        # Reconectar sin cerrar dejaría el socket abierto y una sesión
+        # duplicada con el mismo client_id en el broker
+        if self.sock:
+            try:
+                self.sock.close()
+            except Exception:
+                pass
+            self.sock = None
+            self.poller = None
+            self.connected = False
+
         try:
             print("[MQTT] Conectando al broker...")
             
             ### CREAR SOCKET TCP ###
-            addr_info = socket.getaddrinfo(self.host, self.port)[0][-1]
+            # DNS solo en la primera conexión: las reconexiones reutilizan la IP
+            cached = self._addr is not None
+            if not cached:
+                self._addr = socket.getaddrinfo(self.host, self.port)[0][-1]
             self.sock = socket.socket()
-            self.sock.connect(addr_info)
+            try:
+                self.sock.connect(self._addr)
+            except OSError:
+                if not cached:
+                    raise
+                # La IP cacheada pudo cambiar: resolver de nuevo y reintentar
+                self.sock.close()
+                self._addr = socket.getaddrinfo(self.host, self.port)[0][-1]
+                self.sock = socket.socket()
+                self.sock.connect(self._addr)
             self.sock.settimeout(5)  # Timeout inicial para handshake
+            self._readinto = getattr(self.sock, "readinto", None) or self.sock.recv_into
+            self._set_nodelay()
 
             ### CONSTRUIR PAQUETE CONNECT (MQTT 3.1.1) ###
             vh = b""  # Variable header
             vh += self._encode_str("MQTT")        # Nombre del protocolo
             vh += b"\x04"                         # Nivel de protocolo (3.1.1)
-            flags = 0xC2                          # Flags: user+password+clean session
-            vh += bytes([flags])
+            vh += bytes([_CONNECT_FLAGS])         # Flags: user+password+clean session
             vh += bytes([self.keepalive >> 8, self.keepalive & 0xFF])
 
             # Payload: Client ID, username, password
@@ -177,14 +285,15 @@ class AdafruitMQTT:
 
             # Fixed header: tipo CONNECT (1) + remaining length
             remaining_len = len(vh) + len(payload)
-            fixed_header = b"\x10" + self._encode_varlen(remaining_len)
+            fixed_header = bytes([_CONNECT]) + self._encode_varlen(remaining_len)
 
             ### ENVIAR CONNECT ###
-            self.sock.send(fixed_header + vh + payload)
+            self._send_all(fixed_header + vh + payload)
 
             ### RECIBIR CONNACK (4 bytes esperados) ###
             resp = self.sock.recv(4)
-            if len(resp) != 4 or resp[0] != 0x20 or resp[1] != 0x02 or resp[3] != 0x00:
+            # Tipo 0x20 + longitud 0x02 de una vez; resp[3] = código de retorno
+            if len(resp) != 4 or resp[:2] != b"\x20\x02" or resp[3] != 0:
                 print("[MQTT] ✗ Error en CONNACK:", resp)
                 self.sock.close()
                 self.sock = None
@@ -194,6 +303,8 @@ class AdafruitMQTT:
             ### CONEXIÓN EXITOSA ###
             self.connected = True
             self.sock.settimeout(0)  # No bloqueante para loop principal
+            self.poller = select.poll()
+            self.poller.register(self.sock, select.POLLIN)
             print("[MQTT] ✓ Conectado a Adafruit IO como", self.client_id)
             return True
 
@@ -208,6 +319,51 @@ class AdafruitMQTT:
             self.connected = False
             return False
 
+    def _send_all(self, data):
+        """
+        Envía todos los bytes de data por el socket
+        Con el socket no bloqueante send() puede escribir solo una parte (o
+        ninguna si el buffer TCP está lleno): se reintenta con el resto, porque
+        un paquete MQTT cortado corrompe el flujo para el broker
+        
+        Args:
+            data: bytes, bytearray o memoryview a enviar
+        
+        Lanza OSError (y marca desconectado) si no termina en SEND_TIMEOUT_MS
+        """
+        mv = memoryview(data)
+        total = len(mv)
+        pos = 0
+        start = utime.ticks_ms()
+        while pos < total:
+            try:
+                sent = self.sock.send(mv[pos:])
+            except OSError as e:
+                if e.args[0] != errno.EAGAIN:
+                    self.connected = False
+                    raise
+                sent = 0  # Buffer TCP lleno
+            if sent:
+                pos += sent
+                continue
+            if utime.ticks_diff(utime.ticks_ms(), start) > SEND_TIMEOUT_MS:
+                self.connected = False
+                raise OSError(errno.ETIMEDOUT)
+            utime.sleep_ms(SEND_RETRY_MS)
+
+    def _set_nodelay(self):
+        """
+        Desactiva Nagle (TCP_NODELAY): cada paquete ya armado sale de inmediato
+        sin esperar a juntarse con el siguiente
+        Si el port de MicroPython no soporta la opción, se ignora
+        """
+        proto = getattr(socket, "IPPROTO_TCP", 6)
+        option = getattr(socket, "TCP_NODELAY", 1)
+        try:
+            self.sock.setsockopt(proto, option, 1)
+        except Exception:
+            pass
+
     def disconnect(self):
         """
         Cierra la conexión MQTT limpiamente
@@ -224,6 +380,7 @@ class AdafruitMQTT:
             except Exception:
                 pass
         self.sock = None
+        self.poller = None
         self.connected = False
         print("[MQTT] Desconectado")
 
@@ -243,36 +400,55 @@ class AdafruitMQTT:
             mqtt.subscribe("comando_led")
             # Se suscribe a: username/feeds/comando_led
         """
+        return self.subscribe_many((feed_name,), msg_id)
+
+    def subscribe_many(self, feed_names, msg_id=1):
+        """
+        Suscribe a varios feeds con un único paquete SUBSCRIBE
+        
+        MQTT 3.1.1 admite varios pares (topic, QoS) por paquete: un solo
+        send() y un solo SUBACK en lugar de uno por feed.
+        
+        Args:
+            feed_names: Lista/tupla de nombres de feed (sin prefijo de usuario)
+            msg_id: ID del mensaje MQTT (default: 1)
+        
+        Retorna: True si suscripción exitosa, False si no conectado
+        """
         if not self.connected or not self.sock:
             print("[MQTT] ✗ No conectado, no se puede suscribir")
             return False
 
-        # Construir topic completo
-        topic = "{}/feeds/{}".format(self.username, feed_name)
-        topic_bytes = topic.encode("utf-8")
+        # Construir topics completos
+        topics = [
+            "{}/feeds/{}".format(self.username, name).encode("utf-8")
+            for name in feed_names
+        ]
 
         ### CONSTRUIR PAQUETE SUBSCRIBE ###
         packet = bytearray()
-        packet.append(0x82)  # SUBSCRIBE con QoS1
+        packet.append(_SUBSCRIBE)  # SUBSCRIBE con QoS1
         
-        # Calcular remaining length
-        rem_len = 2 + 2 + len(topic_bytes) + 1
+        # Calcular remaining length: msg_id + (longitud, topic, QoS) por feed
+        rem_len = 2 + sum(2 + len(t) + 1 for t in topics)
         packet.extend(self._encode_varlen(rem_len))
         
         # Message ID (2 bytes)
         packet.append(msg_id >> 8)
         packet.append(msg_id & 0xFF)
         
-        # Topic con longitud prefijada
-        packet.append(len(topic_bytes) >> 8)
-        packet.append(len(topic_bytes) & 0xFF)
-        packet.extend(topic_bytes)
-        
-        # QoS solicitado (0 = at most once)
-        packet.append(0x00)
+        for topic_bytes in topics:
+            # Topic con longitud prefijada
+            packet.append(len(topic_bytes) >> 8)
+            packet.append(len(topic_bytes) & 0xFF)
+            packet.extend(topic_bytes)
+            
+            # QoS solicitado (0 = at most once)
+            packet.append(0x00)
 
-        self.sock.send(packet)
-        print("[MQTT] ✓ Suscrito a feed:", feed_name)
+        self._send_all(packet)
+        for name in feed_names:
+            print("[MQTT] ✓ Suscrito a feed:", name)
         return True
 
     def publish(self, feed_name, value, retain=False):
@@ -294,9 +470,57 @@ class AdafruitMQTT:
             print("[MQTT] ✗ No conectado, no se puede publicar")
             return False
 
-        # Construir topic completo
-        topic = "{}/feeds/{}".format(self.username, feed_name)
-        topic_bytes = topic.encode("utf-8")
+        n = self._write_publish(0, feed_name, value, retain)
+
+        self._send_all(self._tx_mv[:n])
+        print("[MQTT→Cloud] {} = {}".format(feed_name, value))
+        return True
+
+    def publish_many(self, items):
+        """
+        Publica varios valores en un solo envío TCP
+        Concatena los paquetes PUBLISH en un buffer y hace un único send()
+        
+        Args:
+            items: Lista de tuplas (feed_name, value, retain)
+        
+        Retorna: True si publicación exitosa, False si no conectado
+        
+        Ejemplo:
+            mqtt.publish_many([("sensor_temp", 23.5, False),
+                               ("sensor_hum", 45.2, False)])
+        """
+        if not self.connected or not self.sock:
+            print("[MQTT] ✗ No conectado, no se puede publicar")
+            return False
+
+        n = 0
+        for feed_name, value, retain in items:
+            n = self._write_publish(n, feed_name, value, retain)
+
+        self._send_all(self._tx_mv[:n])
+        for feed_name, value, _ in items:
+            print("[MQTT→Cloud] {} = {}".format(feed_name, value))
+        return True
+
+    def _write_publish(self, offset, feed_name, value, retain):
+        """
+        Escribe un paquete PUBLISH (QoS0) en self._tx_buf a partir de offset
+        Sin bytearray nuevo por paquete: menos trabajo para el GC
+        Si el paquete no cabe, envía primero lo acumulado y vuelve a 0
+        
+        Args:
+            offset: Posición del buffer donde empieza el paquete
+            feed_name: Nombre del feed (sin prefijo de usuario)
+            value: Valor a publicar (string, número, o bytes)
+            retain: Retener mensaje en broker
+        
+        Retorna: Posición siguiente al final del paquete
+        """
+        # Topic ya codificado (se registra en el primer uso si falta)
+        var_header = self._topic_cache.get(feed_name)
+        if var_header is None:
+            var_header = self.register_feed(feed_name)
         
         # Convertir valor a bytes
         if not isinstance(value, (bytes, bytearray)):
@@ -305,22 +529,31 @@ class AdafruitMQTT:
             payload = value
 
         ### CONSTRUIR PAQUETE PUBLISH ###
-        header = 0x30  # PUBLISH con QoS0
+        header = _PUBLISH  # PUBLISH con QoS0
         if retain:
             header |= 0x01  # Flag RETAIN
 
-        var_header = self._encode_str(topic_bytes)
         remaining_len = len(var_header) + len(payload)
         
-        packet = bytearray()
-        packet.append(header)
-        packet.extend(self._encode_varlen(remaining_len))
-        packet.extend(var_header)
-        packet.extend(payload)
-
-        self.sock.send(packet)
-        print("[MQTT→Cloud] {} = {}".format(feed_name, value))
-        return True
+        # Espacio máximo: header + 4 bytes de longitud + contenido
+        needed = 5 + remaining_len
+        if offset + needed > len(self._tx_buf):
+            if offset:
+                self._send_all(self._tx_mv[:offset])
+                offset = 0
+            if needed > len(self._tx_buf):
+                # Paquete más grande que el buffer: se agranda una vez
+                self._tx_buf = bytearray(needed)
+                self._tx_mv = memoryview(self._tx_buf)
+        
+        mv = self._tx_mv
+        mv[offset] = header
+        offset = self._write_varlen(mv, offset + 1, remaining_len)
+        end = offset + len(var_header)
+        mv[offset:end] = var_header
+        offset, end = end, end + len(payload)
+        mv[offset:end] = payload
+        return end
 
     # ==================== RECEPCIÓN DE MENSAJES ====================
 
@@ -340,26 +573,53 @@ class AdafruitMQTT:
         self.on_message_callback = callback
         print("[MQTT] Callback de mensajes configurado")
 
-    def _recv_exact(self, n):
+    def wait_readable(self, timeout_ms):
+        """
+        Duerme hasta que lleguen datos al socket o pase timeout_ms
+        Reemplaza el sondeo periódico de check_messages() en el loop principal
+        
+        Args:
+            timeout_ms: Espera máxima en milisegundos
+        
+        Retorna: True si hay datos para check_messages(), False si timeout
+        """
+        if not self.poller:
+            utime.sleep_ms(timeout_ms)
+            return False
+        return bool(self.poller.poll(timeout_ms))
+
+    def _recv_exact(self, n, start=0):
         """
-        Lee exactamente n bytes del socket
+        Lee exactamente n bytes del socket en self._rx_buf[start:start+n]
+        Lectura directa al buffer (readinto): sin bytes nuevos por fragmento
         Maneja socket no bloqueante y buffers incompletos
         
         Args:
             n: Número de bytes a leer
+            start: Posición del buffer donde escribir (no pisa lo ya leído)
         
-        Retorna: bytes de longitud n, o None si falla
+        Retorna: memoryview de longitud n (válido hasta la próxima lectura),
+                 o None si falla
         """
-        data = bytearray()
-        while len(data) < n:
+        end = start + n
+        if end > len(self._rx_buf):
+            # Mensaje más grande que el buffer: se agranda conservando lo leído
+            buf = bytearray(end)
+            buf[:start] = self._rx_buf[:start]
+            self._rx_buf = buf
+            self._rx_mv = memoryview(buf)
+        
+        mv = self._rx_mv
+        pos = start
+        while pos < end:
             try:
-                chunk = self.sock.recv(n - len(data))
+                got = self._readinto(mv[pos:end])
             except OSError:
                 return None  # No hay datos disponibles
-            if not chunk:
-                return None  # Conexión cerrada
-            data.extend(chunk)
-        return bytes(data)
+            if not got:
+                return None  # Sin datos (None) o conexión cerrada (0)
+            pos += got
+        return mv[start:end]
 
     def _read_remaining_length(self):
         """
@@ -386,7 +646,9 @@ class AdafruitMQTT:
         Verifica mensajes PUBLISH entrantes y ejecuta callback
         Debe llamarse periódicamente en el loop principal
         
-        Socket no bloqueante: retorna inmediatamente si no hay datos
+        Procesa todos los paquetes ya recibidos (hasta MAX_MESSAGES_PER_CHECK)
+        en una sola llamada: una ráfaga de comandos no espera al próximo ciclo
+        Socket no bloqueante: retorna en cuanto no quedan datos
         
         Retorna: 
             True si operación exitosa (con o sin mensajes)
@@ -401,14 +663,31 @@ class AdafruitMQTT:
         if not self.connected or not self.sock:
             return False
 
+        for _ in range(MAX_MESSAGES_PER_CHECK):
+            result = self._process_packet()
+            if result is None:
+                return True  # No quedan datos pendientes
+            if not result:
+                return False
+        return True
+
+    def _process_packet(self):
+        """
+        Lee un paquete MQTT del socket y, si es PUBLISH, ejecuta el callback
+        
+        Retorna:
+            None si no hay datos disponibles
+            True si se procesó un paquete
+            False si error grave de conexión
+        """
         ### LEER FIXED HEADER ###
         try:
             hdr = self.sock.recv(1)
         except OSError:
-            return True  # No hay datos (socket no bloqueante)
+            return None  # No hay datos (socket no bloqueante)
 
         if not hdr:
-            return True  # Sin datos, pero conexión OK
+            return False  # Socket legible sin datos: el broker cerró la conexión
 
         # Extraer tipo de paquete
         packet_type = hdr[0] >> 4
@@ -434,22 +713,24 @@ class AdafruitMQTT:
         topic_len = (tl_bytes[0] << 8) | tl_bytes[1]
         
         # Leer topic
-        topic = self._recv_exact(topic_len)
+        topic = self._recv_exact(topic_len, 2)
         if topic is None:
             return False
 
         # Leer payload
         payload_len = rem_len - 2 - topic_len
-        payload = self._recv_exact(payload_len) if payload_len > 0 else b""
+        payload = self._recv_exact(payload_len, 2 + topic_len) if payload_len > 0 else b""
+        if payload is None:
+            return False
 
         ### DECODIFICAR Y EJECUTAR CALLBACK ###
         try:
-            topic_str = topic.decode("utf-8")
+            topic_str = bytes(topic).decode("utf-8")
         except Exception:
             topic_str = str(topic)
         
         try:
-            payload_str = payload.decode("utf-8")
+            payload_str = bytes(payload).decode("utf-8")
         except Exception:
             payload_str = str(payload)
 
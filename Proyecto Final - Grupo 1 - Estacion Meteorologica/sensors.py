@@ -3,11 +3,17 @@
 # Interfaces para LDR (luz) y DHT22 (temperatura/humedad)
 
 from machine import ADC, Pin
+from micropython import const
 import dht
+import utime
 
 # ==================== CONSTANTES ====================
 
 VREF = 3.3  # Voltaje de referencia del ADC
+VREF_MV = const(3300)  # Mismo voltaje en mV, para escalar con enteros
+ADC_MAX = const(65535)  # Valor máximo de read_u16()
+ADC_HALF = const(ADC_MAX // 2)  # Sumado antes de dividir: redondeo al más cercano
+DHT_MIN_INTERVAL_MS = const(2000)  # Intervalo mínimo entre mediciones del DHT22
 
 # ==================== CLASE LDR ====================
 
@@ -26,6 +32,7 @@ class LDR:
         pct = ldr.read_pct()      # Porcentaje 0-100%
         raw = ldr.read_raw()      # Valor ADC 0-65535
         vol = ldr.read_voltage()  # Voltaje 0-3.3V
+        raw, pct, vol = ldr.sample()  # Los tres de una sola lectura ADC
     """
     
     def __init__(self, adc_pin=26, do_pin=None):
@@ -59,8 +66,22 @@ class LDR:
         Returns:
             float: Porcentaje 0-100% (1 decimal)
         """
-        raw = self.read_raw()
-        return round((raw / 65535.0) * 100, 1)
+        # Décimas de % con aritmética entera; una sola división float al final
+        raw = self.adc.read_u16()
+        return ((raw * 1000 + ADC_HALF) // ADC_MAX) / 10.0
+
+    def sample(self):
+        """
+        Lee raw, porcentaje y voltaje de una sola conversión ADC
+        Los tres valores corresponden a la misma muestra
+        
+        Returns:
+            tuple: (raw 0-65535, porcentaje 0-100% 1 decimal, voltaje 0-3.3V 3 decimales)
+        """
+        raw = self.adc.read_u16()
+        pct = ((raw * 1000 + ADC_HALF) // ADC_MAX) / 10.0
+        voltage = ((raw * VREF_MV + ADC_HALF) // ADC_MAX) / 1000.0
+        return raw, pct, voltage
 
     def read_voltage(self):
         """
@@ -74,8 +95,9 @@ class LDR:
             - ~3.3V: Señal saturada
             - 0.5-2.8V: Rango normal
         """
-        raw = self.read_raw()
-        return round((raw / 65535.0) * VREF, 3)
+        # mV con aritmética entera; una sola división float al final
+        raw = self.adc.read_u16()
+        return ((raw * VREF_MV + ADC_HALF) // ADC_MAX) / 1000.0
 
     def read_do(self):
         """
@@ -126,6 +148,11 @@ class DHT22Sensor:
             DHT22 GND  → GND
         """
         self.sensor = dht.DHT22(Pin(pin))
+        
+        # Última lectura válida (se reutiliza dentro del intervalo mínimo)
+        self._last_ts = 0
+        self._last_t = None
+        self._last_h = None
 
     def read(self):
         """
@@ -144,13 +171,24 @@ class DHT22Sensor:
         Frecuencia recomendada:
             - Mínimo: 2 segundos entre lecturas
             - Óptimo: 5-10 segundos
+        
+        Si se llama antes de DHT_MIN_INTERVAL_MS desde la última lectura
+        válida, devuelve esa lectura sin volver a medir
         """
+        now = utime.ticks_ms()
+        if (self._last_t is not None and
+                utime.ticks_diff(now, self._last_ts) < DHT_MIN_INTERVAL_MS):
+            return self._last_t, self._last_h
+        
         try:
             self.sensor.measure()  # Inicia lectura (~5ms)
             
             t = round(self.sensor.temperature(), 1)
             h = round(self.sensor.humidity(), 1)
             
+            self._last_ts = now
+            self._last_t = t
+            self._last_h = h
             return t, h
             
         except Exception:
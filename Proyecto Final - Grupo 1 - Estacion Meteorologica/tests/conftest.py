@@ -0,0 +1,11 @@
+# conftest.py
+# Configuración de pytest para los módulos del dispositivo
+# Ejecutar en una PC (CPython) desde la carpeta del proyecto: python -m pytest tests
+#
+# utils.py se importa sin MicroPython gracias a sus imports con respaldo
+# (time en lugar de utime, const() y micropython.native sin efecto)
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,146 @@
+# test_utils.py
+# Las tablas y clasificadores de utils.py frente a las fórmulas originales
+# (cadenas de if y math.sin() por lectura) que reemplazaron
+
+import math
+
+import pytest
+
+import utils
+
+
+# ==================== FÓRMULAS ORIGINALES ====================
+
+def _fase(hora_decimal):
+    return ((hora_decimal - 6) / 24.0) * 2 * math.pi
+
+
+def _luz_original(hora_decimal):
+    """Franjas de luz originales: (luminosidad sin ruido, amplitud de ruido)"""
+    hd = hora_decimal
+    if hd < 6:
+        return 5, 3
+    elif hd < 8:
+        return 20 + (hd - 6) / 2 * 30, 5
+    elif hd < 12:
+        return 50 + (hd - 8) / 4 * 35, 8
+    elif hd < 14:
+        return 85, 10
+    elif hd < 18:
+        return 70 - (hd - 14) / 4 * 30, 8
+    elif hd < 20:
+        return 40 - (hd - 18) / 2 * 30, 5
+    else:
+        return 10 - (hd - 20) / 4 * 5, 3
+
+
+def _confort_original(temp, hum):
+    es_humedo = hum > 70
+    es_seco = hum < 30
+    if temp < 15:
+        return "Frio Humedo" if es_humedo else "Frio"
+    elif temp < 20:
+        return "Fresco Humedo" if es_humedo else "Fresco"
+    elif temp < 24:
+        if es_seco:
+            return "Confortable Seco"
+        elif es_humedo:
+            return "Confortable Humedo"
+        return "Confortable"
+    elif temp < 28:
+        return "Tibio Humedo" if es_humedo else "Tibio"
+    elif temp < 32:
+        return "Caluroso Humedo" if es_humedo else "Caluroso"
+    return "Muy Caluroso Humedo" if es_humedo else "Muy Caluroso"
+
+
+def _luminosidad_original(pct):
+    if pct >= 80.0:
+        return "Muy Luminoso"
+    elif pct >= 60.0:
+        return "Luminoso"
+    elif pct >= 40.0:
+        return "Iluminacion Media"
+    elif pct >= 20.0:
+        return "Tenue"
+    return "Oscuro"
+
+
+def _hora_original(hora, minuto):
+    if hora == 0:
+        hora_12h, periodo = 12, "AM"
+    elif hora < 12:
+        hora_12h, periodo = hora, "AM"
+    elif hora == 12:
+        hora_12h, periodo = 12, "PM"
+    else:
+        hora_12h, periodo = hora - 12, "PM"
+    return f"{hora_12h:02d}:{minuto:02d} {periodo}"
+
+
+# ==================== TABLAS PRECALCULADAS ====================
+
+def test_tabla_de_senos():
+    for i in range(utils.SIN_PASOS_DIA):
+        esperado = math.sin(2 * math.pi * i / utils.SIN_PASOS_DIA)
+        assert utils._SIN_TABLE[i] == pytest.approx(esperado, abs=1e-6)
+
+
+def test_tablas_de_temperatura_y_humedad():
+    for m in range(utils.MINUTOS_DIA):
+        s = math.sin(_fase(m / 60.0))
+        assert utils._TEMP_BASE[m] == pytest.approx(23.0 + s * 6.0, abs=1e-5)
+        assert utils._HUM_BASE[m] == pytest.approx(55.0 - s * 15.0, abs=1e-5)
+
+
+def test_tablas_de_luminosidad():
+    for m in range(utils.MINUTOS_DIA):
+        luz, amplitud = _luz_original(m / 60.0)
+        assert utils._LUZ_BASE[m] == pytest.approx(luz, abs=1e-4)
+        assert utils._LUZ_AMP[m] == amplitud
+
+
+@pytest.mark.parametrize('hd', [0.0, 5.99, 6.0, 7.5, 8.0, 11.3, 12.0, 13.99,
+                                14.0, 17.2, 18.0, 19.5, 20.0, 23.99])
+def test_luz_tramo_en_cualquier_hora(hd):
+    # _luz_tramo también sirve para horas que no caen en minutos exactos
+    luz, amplitud = utils._luz_tramo(hd)
+    esperado, amplitud_esperada = _luz_original(hd)
+    assert luz == pytest.approx(esperado)
+    assert amplitud == amplitud_esperada
+
+
+# ==================== CLASIFICADORES ====================
+
+_TEMPS = [-5.0, 14.9, 15.0, 19.9, 20.0, 23.9, 24.0, 27.9, 28.0, 31.9, 32.0, 40.0]
+_HUMS = [0.0, 29.9, 30.0, 50.0, 70.0, 70.1, 100.0]
+
+
+@pytest.mark.parametrize('temp', _TEMPS)
+@pytest.mark.parametrize('hum', _HUMS)
+def test_confort_igual_a_la_cadena_original(temp, hum):
+    assert utils.calcular_confort_termico(temp, hum) == _confort_original(temp, hum)
+
+
+@pytest.mark.parametrize('temp, hum', [
+    (None, 50), (20, None), (utils.ANOMALIA, 50), (20, utils.ANOMALIA), ('x', 50),
+])
+def test_confort_datos_invalidos(temp, hum):
+    assert utils.calcular_confort_termico(temp, hum) == utils.ANOMALIA
+
+
+@pytest.mark.parametrize('pct', [-1, 0, 19.9, 20, 39.9, 40, 59.9, 60, 79.9, 80, 100, '45'])
+def test_luminosidad_igual_a_la_cadena_original(pct):
+    assert utils.descripcion_luminosidad(pct) == _luminosidad_original(float(pct))
+
+
+@pytest.mark.parametrize('pct', [None, 'x'])
+def test_luminosidad_desconocida(pct):
+    assert utils.descripcion_luminosidad(pct) == "Desconocido"
+
+
+def test_hora_12h_todo_el_dia(monkeypatch):
+    for minuto_dia in range(utils.MINUTOS_DIA):
+        hora, minuto = divmod(minuto_dia, 60)
+        monkeypatch.setattr(utils, '_tick_hora', (hora, minuto, 0))
+        assert utils.obtener_hora_actual() == _hora_original(hora, minuto)
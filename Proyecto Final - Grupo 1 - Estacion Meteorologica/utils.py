@@ -3,8 +3,44 @@
 # + SIMULADOR DE TIEMPO ACELERADO (24h en 5 minutos)
 # ✨ Manejo de valores anómalos
 
-import utime
+try:
+    import utime
+except ImportError:
+    import time as utime  # type: ignore  # CPython: solo se usan time() y localtime()
 import math
+import array
+
+try:
+    import micropython
+    from micropython import const
+except ImportError:
+    # Fuera del dispositivo: const() devuelve el valor y native no hace nada.
+    # Se conserva el nombre micropython.native porque el compilador de
+    # MicroPython solo reconoce el decorador escrito así
+    class micropython:  # type: ignore
+        @staticmethod
+        def native(f):
+            return f
+
+    def const(x):  # type: ignore
+        return x
+
+try:
+    import numpy as np  # Solo para obtener_series() fuera del dispositivo
+except ImportError:
+    np = None
+
+try:
+    from bisect import bisect_right
+except ImportError:
+    # MicroPython no incluye bisect: búsqueda lineal (tablas de pocos umbrales)
+    def bisect_right(a, x):
+        i = 0
+        for v in a:
+            if x < v:
+                break
+            i += 1
+        return i
 
 # ==================== CONFIGURACIÓN ====================
 
@@ -15,24 +51,56 @@ import math
 MODO_SIMULACION = True
 
 ### PARÁMETROS DE SIMULACIÓN ###
-ACELERACION_TIEMPO = 288    # Factor de aceleración (86400s / 300s)
-HORA_INICIO_SIM = 6         # Hora de inicio del ciclo simulado (6:00 AM)
+# const(): el compilador de MicroPython reemplaza cada uso por el valor
+ACELERACION_TIEMPO = const(288)  # Factor de aceleración (86400s / 300s)
+HORA_INICIO_SIM = const(6)       # Hora de inicio del ciclo simulado (6:00 AM)
 
 ### UMBRALES DE LUMINOSIDAD (%) ###
 # Definen los rangos para clasificar la luz ambiente
-UMBRAL_MUY_LUMINOSO = 80.0  # >= 80%: Muy luminoso
-UMBRAL_LUMINOSO = 60.0      # >= 60%: Luminoso
-UMBRAL_MEDIO = 40.0         # >= 40%: Iluminación media
-UMBRAL_TENUE = 20.0         # >= 20%: Tenue, < 20%: Oscuro
+# Enteros para poder usar const() (la comparación con float no cambia)
+UMBRAL_MUY_LUMINOSO = const(80)  # >= 80%: Muy luminoso
+UMBRAL_LUMINOSO = const(60)      # >= 60%: Luminoso
+UMBRAL_MEDIO = const(40)         # >= 40%: Iluminación media
+UMBRAL_TENUE = const(20)         # >= 20%: Tenue, < 20%: Oscuro
+
+# Umbrales ordenados y nombre de cada rango: el índice que devuelve
+# bisect_right(_LUZ_UMBRALES, pct) es la posición en _LUZ_NOMBRES
+_LUZ_UMBRALES = (UMBRAL_TENUE, UMBRAL_MEDIO, UMBRAL_LUMINOSO, UMBRAL_MUY_LUMINOSO)
+_LUZ_NOMBRES = ("Oscuro", "Tenue", "Iluminacion Media", "Luminoso", "Muy Luminoso")
 
 ### CONSTANTE PARA VALORES ANÓMALOS ###
 ANOMALIA = "ANOMALIA"  # Marcador para lecturas de sensores fallidas
 
+### FORMATO 12H ###
+_PERIODO = ("AM", "PM")  # Indexado por hora // 12 (0-11 -> AM, 12-23 -> PM)
+_hora_cache = [None, "N/A"]  # [minuto del día, texto]: solo cambia cada minuto
+
+### FRANJAS DE LUZ NATURAL ###
+# (hora_fin, base, pendiente_por_hora, amplitud_ruido) de cada franja; la
+# franja empieza donde termina la anterior (la primera a las 0:00)
+_LUZ_TRAMOS = (
+    (6.0, 5.0, 0.0, 3.0),      # Noche
+    (8.0, 20.0, 15.0, 5.0),    # Amanecer
+    (12.0, 50.0, 8.75, 8.0),   # Mañana
+    (14.0, 85.0, 0.0, 10.0),   # Mediodía (pico máximo)
+    (18.0, 70.0, -7.5, 8.0),   # Tarde
+    (20.0, 40.0, -15.0, 5.0),  # Atardecer
+    (24.0, 10.0, -1.25, 3.0),  # Noche
+)
+
+### TABLA DE SENOS ###
+# sin() precalculado en 288 pasos: _ruido() recorre la tabla en lugar de
+# calcular sin() en cada lectura
+SIN_PASOS_DIA = const(288)
+_SIN_TABLE = array.array('f', [math.sin(2 * math.pi * i / SIN_PASOS_DIA)
+                               for i in range(SIN_PASOS_DIA)])
+RUIDO_PASO = const(6)  # Avance por llamada (~0.13 rad, similar al ruido original)
+
 # ==================== VARIABLES GLOBALES DE SIMULACIÓN ====================
 
 # Mantienen el estado del simulador entre llamadas
 _sim_tiempo_inicio = None   # Timestamp de inicio de la simulación
-_sim_ruido_contador = 0     # Contador para generar ruido pseudo-aleatorio
+_sim_ruido_contador = 0     # Índice en _SIN_TABLE para el ruido pseudo-aleatorio
 
 def _inicializar_simulacion():
     """
@@ -76,16 +144,151 @@ def _obtener_hora_simulada():
     
     return hora, minuto, segundo
 
+@micropython.native
 def _ruido():
     """
     Genera variación pseudo-aleatoria para simular fluctuaciones naturales
-    Usa función seno con contador incremental para variabilidad
+    Recorre la tabla de senos avanzando RUIDO_PASO posiciones por llamada
+    
+    El contador ya es el índice de la tabla (siempre < SIN_PASOS_DIA): no
+    crece sin límite ni necesita multiplicarse en cada llamada
     
     Retorna: Valor flotante entre -1.0 y 1.0
     """
     global _sim_ruido_contador
-    _sim_ruido_contador += 1
-    return math.sin(_sim_ruido_contador * 0.1234)
+    _sim_ruido_contador = (_sim_ruido_contador + RUIDO_PASO) % SIN_PASOS_DIA
+    return _SIN_TABLE[_sim_ruido_contador]
+
+### TICK DE SIMULACIÓN ###
+_tick_hora = None  # Hora simulada fijada para el ciclo actual (ver TickSensores)
+
+def refrescar_tick():
+    """
+    Fija la hora simulada para el ciclo de lectura actual
+    Las funciones simuladas y obtener_hora_actual() la usan en lugar de
+    llamar cada una a _obtener_hora_simulada()
+    """
+    global _tick_hora
+    _tick_hora = _obtener_hora_simulada()
+
+class TickSensores:
+    """
+    Context manager para un ciclo de lectura de sensores simulados
+    Dentro del bloque todas las lecturas comparten la misma hora simulada
+    (una sola llamada a _obtener_hora_simulada); al salir se libera
+    
+    Ejemplo:
+        with TickSensores():
+            temp = obtener_temperatura_simulada()
+            hum = obtener_humedad_simulada()
+            hora = obtener_hora_actual()
+    """
+    def __enter__(self):
+        refrescar_tick()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        global _tick_hora
+        _tick_hora = None
+        return False
+
+def _obtener_minuto():
+    """
+    Minuto del día simulado actual (índice en las tablas diarias)
+    Usa la hora fijada por TickSensores si hay un ciclo en curso
+    
+    Retorna: Entero 0-1439
+    """
+    hora, minuto, _ = _tick_hora or _obtener_hora_simulada()
+    return hora * 60 + minuto
+
+def _luz_tramo(hora_decimal):
+    """
+    Evalúa la franja de luz natural (ver _LUZ_TRAMOS) para una hora decimal
+    
+    Retorna: (luminosidad_sin_ruido, amplitud_ruido)
+    """
+    inicio = 0.0
+    for fin, base, pendiente, amplitud in _LUZ_TRAMOS:
+        if hora_decimal < fin:
+            break
+        inicio = fin
+    return base + pendiente * (hora_decimal - inicio), amplitud
+
+def _temperatura_base(seno):
+    """
+    Temperatura sin ruido para un valor de la curva diaria
+    Promedio 23°C, amplitud ±6°C
+    """
+    return 23.0 + seno * 6.0
+
+def _humedad_base(seno):
+    """
+    Humedad sin ruido (inversa a la temperatura) para un valor de la curva
+    Promedio 55%, amplitud ±15% inversa
+    """
+    return 55.0 - seno * 15.0
+
+### NÚCLEOS NUMÉRICOS ###
+# Ruido y límites sobre el valor base, compilados a código nativo (como
+# _ruido); MicroPython los compila al importar
+
+@micropython.native
+def _temperatura_curva(base):
+    """
+    Temperatura simulada a partir de la temperatura base
+    
+    Args:
+        base: Temperatura sin ruido (ver _temperatura_base)
+    
+    Retorna: Temperatura en °C sin redondear
+    """
+    return base + _ruido() * 0.8  # Fluctuación pequeña
+
+@micropython.native
+def _humedad_curva(base):
+    """
+    Humedad simulada a partir de la humedad base
+    
+    Args:
+        base: Humedad sin ruido (ver _humedad_base)
+    
+    Retorna: Humedad en % sin redondear, limitada a 20-90%
+    """
+    hum = base + _ruido() * 3.0  # Fluctuación moderada
+    # Limitar a rango realista (comparaciones en lugar de max()/min())
+    return 20.0 if hum < 20 else (90.0 if hum > 90 else hum)
+
+### TABLAS DIARIAS POR MINUTO ###
+# El patrón base solo depende del minuto del día: se precalcula una vez
+# al arrancar (~19 KB) y cada lectura es un índice + ruido + límites
+MINUTOS_DIA = const(1440)
+_TEMP_BASE = None  # array('f'): temperatura sin ruido por minuto
+_HUM_BASE = None   # array('f'): humedad sin ruido por minuto
+_LUZ_BASE = None   # array('f'): luminosidad sin ruido por minuto
+_LUZ_AMP = None    # bytearray: amplitud de ruido de la franja de luz
+
+def _init_tablas():
+    """
+    Precalcula las tablas diarias de temperatura, humedad y luminosidad
+    Se ejecuta una sola vez al importar si MODO_SIMULACION=True
+    """
+    global _TEMP_BASE, _HUM_BASE, _LUZ_BASE, _LUZ_AMP
+    ceros = [0.0] * MINUTOS_DIA
+    _TEMP_BASE = array.array('f', ceros)
+    _HUM_BASE = array.array('f', ceros)
+    _LUZ_BASE = array.array('f', ceros)
+    _LUZ_AMP = bytearray(MINUTOS_DIA)
+    
+    for m in range(MINUTOS_DIA):
+        hd = m / 60.0
+        # Curva diaria desfasada 6 horas: mínimo a las 6am, máximo a las 12pm+
+        s = math.sin(((hd - 6) / 24.0) * 2 * math.pi)
+        _TEMP_BASE[m] = _temperatura_base(s)
+        _HUM_BASE[m] = _humedad_base(s)
+        luz, amplitud = _luz_tramo(hd)
+        _LUZ_BASE[m] = luz
+        _LUZ_AMP[m] = int(amplitud)
 
 # ==================== FUNCIONES PÚBLICAS ====================
 
@@ -104,7 +307,7 @@ def obtener_hora_actual():
     try:
         # Determinar fuente de tiempo
         if MODO_SIMULACION:
-            hora_sim = _obtener_hora_simulada()
+            hora_sim = _tick_hora or _obtener_hora_simulada()
             if hora_sim:
                 hora, minuto, _ = hora_sim
             else:
@@ -114,28 +317,26 @@ def obtener_hora_actual():
             t = utime.localtime()
             hora, minuto = t[3], t[4]
         
+        # Mismo minuto que la llamada anterior: reutilizar el texto
+        clave = hora * 60 + minuto
+        if _hora_cache[0] == clave:
+            return _hora_cache[1]
+        
         ### CONVERSIÓN A FORMATO 12H ###
-        if hora == 0:
-            hora_12h = 12
-            periodo = "AM"
-        elif hora < 12:
-            hora_12h = hora
-            periodo = "AM"
-        elif hora == 12:
-            hora_12h = 12
-            periodo = "PM"
-        else:
-            hora_12h = hora - 12
-            periodo = "PM"
+        # 0 -> 12 AM, 1-11 -> AM, 12 -> 12 PM, 13-23 -> 1-11 PM
+        hora_12h = (hora + 11) % 12 + 1
+        periodo = _PERIODO[hora // 12]
         
-        return f"{hora_12h:02d}:{minuto:02d} {periodo}"
+        _hora_cache[1] = f"{hora_12h:02d}:{minuto:02d} {periodo}"
+        _hora_cache[0] = clave
+        return _hora_cache[1]
     except Exception:
         return "N/A"
 
-def obtener_temperatura_simulada():
+def _sim_temperatura():
     """
     Simula temperatura con patrón diario realista
-    Solo funciona si MODO_SIMULACION=True
+    Publicada como obtener_temperatura_simulada() si MODO_SIMULACION=True
     
     Patrón basado en ciclo natural:
     - Mínima: ~6:00 AM (~18°C)
@@ -143,68 +344,31 @@ def obtener_temperatura_simulada():
     - Usa función seno para transición suave
     - Añade ruido para variabilidad realista
     
-    Retorna: Temperatura en °C (float) o None si simulación desactivada
+    Retorna: Temperatura en °C (float)
     """
-    if not MODO_SIMULACION:
-        return None
-    
-    hora_sim = _obtener_hora_simulada()
-    if not hora_sim:
-        return None
-    
-    hora, minuto, _ = hora_sim
-    hora_decimal = hora + minuto / 60.0
-    
-    ### PATRÓN SINUSOIDAL ###
-    # Desplazar fase para mínimo a las 6am
-    fase = ((hora_decimal - 6) / 24.0) * 2 * math.pi
-    variacion = math.sin(fase) * 6.0  # Amplitud de ±6°C
-    
-    ### CALCULAR TEMPERATURA ###
-    temp_base = 23.0  # Temperatura promedio
-    ruido = _ruido() * 0.8  # Fluctuación pequeña
-    
-    temp = temp_base + variacion + ruido
-    return round(temp, 1)
+    ### PATRÓN SINUSOIDAL (TABLA POR MINUTO) ###
+    # Redondeo a 1 decimal sin round(): los valores simulados son positivos
+    return int(_temperatura_curva(_TEMP_BASE[_obtener_minuto()]) * 10 + 0.5) / 10
 
-def obtener_humedad_simulada():
+def _sim_humedad():
     """
     Simula humedad relativa con patrón inverso a temperatura
-    Solo funciona si MODO_SIMULACION=True
+    Publicada como obtener_humedad_simulada() si MODO_SIMULACION=True
     
     Patrón natural:
     - Alta en la mañana/noche (cuando es más frío)
     - Baja al mediodía (cuando hace más calor)
     - Limitada al rango 20-90% para realismo
     
-    Retorna: Humedad en % (float) o None si simulación desactivada
+    Retorna: Humedad en % (float)
     """
-    if not MODO_SIMULACION:
-        return None
-    
-    hora_sim = _obtener_hora_simulada()
-    if not hora_sim:
-        return None
-    
-    hora, minuto, _ = hora_sim
-    hora_decimal = hora + minuto / 60.0
-    
-    ### PATRÓN INVERSO A TEMPERATURA ###
-    fase = ((hora_decimal - 6) / 24.0) * 2 * math.pi
-    variacion = -math.sin(fase) * 15.0  # Amplitud de ±15%, inversa
-    
-    ### CALCULAR HUMEDAD ###
-    hum_base = 55.0  # Humedad promedio
-    ruido = _ruido() * 3.0  # Fluctuación moderada
-    
-    hum = hum_base + variacion + ruido
-    hum = max(20, min(90, hum))  # Limitar a rango realista
-    return round(hum, 1)
+    ### PATRÓN INVERSO A TEMPERATURA (TABLA POR MINUTO) ###
+    return int(_humedad_curva(_HUM_BASE[_obtener_minuto()]) * 10 + 0.5) / 10
 
-def obtener_luminosidad_simulada():
+def _sim_luminosidad():
     """
     Simula luminosidad según hora del día con patrón natural
-    Solo funciona si MODO_SIMULACION=True
+    Publicada como obtener_luminosidad_simulada() si MODO_SIMULACION=True
     
     Patrón de luz natural:
     - 00:00-06:00: Noche (5-10%)
@@ -215,42 +379,113 @@ def obtener_luminosidad_simulada():
     - 18:00-20:00: Atardecer gradual (40-10%)
     - 20:00-24:00: Noche (5-10%)
     
-    Retorna: Luminosidad en % (float) o None si simulación desactivada
+    Retorna: Luminosidad en % (float)
     """
-    if not MODO_SIMULACION:
-        return None
+    m = _obtener_minuto()
     
-    hora_sim = _obtener_hora_simulada()
-    if not hora_sim:
-        return None
-    
-    hora, minuto, _ = hora_sim
-    hora_decimal = hora + minuto / 60.0
-    
-    ### CÁLCULO POR FRANJAS HORARIAS ###
-    if hora_decimal < 6:  # Noche
-        luz = 5 + _ruido() * 3
-    elif hora_decimal < 8:  # Amanecer
-        progreso = (hora_decimal - 6) / 2
-        luz = 20 + progreso * 30 + _ruido() * 5
-    elif hora_decimal < 12:  # Mañana
-        progreso = (hora_decimal - 8) / 4
-        luz = 50 + progreso * 35 + _ruido() * 8
-    elif hora_decimal < 14:  # Mediodía (pico máximo)
-        luz = 85 + _ruido() * 10
-    elif hora_decimal < 18:  # Tarde
-        progreso = (hora_decimal - 14) / 4
-        luz = 70 - progreso * 30 + _ruido() * 8
-    elif hora_decimal < 20:  # Atardecer
-        progreso = (hora_decimal - 18) / 2
-        luz = 40 - progreso * 30 + _ruido() * 5
-    else:  # Noche
-        progreso = (hora_decimal - 20) / 4
-        luz = 10 - progreso * 5 + _ruido() * 3
+    ### CÁLCULO POR FRANJAS HORARIAS (TABLA POR MINUTO) ###
+    # Recta de la franja (ver _LUZ_TRAMOS) + ruido de la amplitud de la franja
+    luz = _LUZ_BASE[m] + _ruido() * _LUZ_AMP[m]
     
     # Asegurar rango válido 0-100%
-    luz = max(0, min(100, luz))
-    return round(luz, 1)
+    luz = 0.0 if luz < 0 else (100.0 if luz > 100 else luz)
+    return int(luz * 10 + 0.5) / 10
+
+def obtener_series(horas_decimales):
+    """
+    Genera series completas de temperatura, humedad y luminosidad
+    Pensado para simulaciones offline (repetir patrones, generar datos)
+    
+    Con NumPy disponible se calcula vectorizado: un solo np.sin() y una
+    búsqueda de franjas para toda la serie. Sin NumPy (MicroPython) se
+    recorre la lista con las mismas fórmulas. Las horas no tienen que caer
+    en minutos exactos (no se usan las tablas diarias) y el ruido consume
+    _ruido() en el mismo orden que tres lecturas temp/hum/luz por muestra.
+    
+    Args:
+        horas_decimales: Secuencia de horas del día (0.0 - 24.0)
+    
+    Retorna: (temps, hums, luzs) redondeados a 1 decimal, como arrays de
+             NumPy o listas según disponibilidad
+    """
+    global _sim_ruido_contador
+    
+    if np is None:
+        temps, hums, luzs = [], [], []
+        for hd in horas_decimales:
+            s = math.sin(((hd - 6) / 24.0) * 2 * math.pi)
+            temps.append(int(_temperatura_curva(_temperatura_base(s)) * 10 + 0.5) / 10)
+            hums.append(int(_humedad_curva(_humedad_base(s)) * 10 + 0.5) / 10)
+            luz, amplitud = _luz_tramo(hd)
+            luz += _ruido() * amplitud
+            luz = 0.0 if luz < 0 else (100.0 if luz > 100 else luz)
+            luzs.append(int(luz * 10 + 0.5) / 10)
+        return temps, hums, luzs
+    
+    hd = np.asarray(horas_decimales, dtype=float)
+    n = len(hd)
+    s = np.sin(((hd - 6) / 24.0) * 2 * np.pi)
+    
+    ### RUIDO: 3 POSICIONES CONSECUTIVAS DE _SIN_TABLE POR MUESTRA ###
+    pasos = np.arange(1, 3 * n + 1).reshape(n, 3) * RUIDO_PASO
+    ruido = np.asarray(_SIN_TABLE)[(_sim_ruido_contador + pasos) % SIN_PASOS_DIA]
+    _sim_ruido_contador = (_sim_ruido_contador + 3 * n * RUIDO_PASO) % SIN_PASOS_DIA
+    
+    ### FRANJAS DE LUZ ###
+    tramos = np.asarray(_LUZ_TRAMOS)
+    i = np.minimum(np.searchsorted(tramos[:, 0], hd, side="right"), len(tramos) - 1)
+    inicio = np.concatenate(([0.0], tramos[:-1, 0]))[i]
+    _, base, pendiente, amplitud = tramos[i].T
+    
+    temps = 23.0 + 6.0 * s + ruido[:, 0] * 0.8
+    hums = np.clip(55.0 - 15.0 * s + ruido[:, 1] * 3.0, 20, 90)
+    luzs = np.clip(base + pendiente * (hd - inicio) + ruido[:, 2] * amplitud, 0, 100)
+    # Mismo redondeo (mitades hacia arriba) que las funciones simuladas
+    return (np.floor(temps * 10 + 0.5) / 10, np.floor(hums * 10 + 0.5) / 10,
+            np.floor(luzs * 10 + 0.5) / 10)
+
+### CATEGORÍAS DE CONFORT ###
+# Índice devuelto por _confort_codigo() -> nombre publicado
+_CONFORT_NOMBRES = (
+    "Frio", "Frio Humedo",
+    "Fresco", "Fresco Humedo",
+    "Confortable", "Confortable Humedo", "Confortable Seco",
+    "Tibio", "Tibio Humedo",
+    "Caluroso", "Caluroso Humedo",
+    "Muy Caluroso", "Muy Caluroso Humedo",
+)
+
+@micropython.native
+def _confort_codigo(temp, hum):
+    """
+    Núcleo numérico de calcular_confort_termico(), compilado a código
+    nativo: solo comparaciones, sin validación ni cadenas
+    
+    Args:
+        temp: Temperatura en °C (float)
+        hum: Humedad relativa en % (float)
+    
+    Retorna: Índice en _CONFORT_NOMBRES
+    """
+    ### CLASIFICACIÓN DE HUMEDAD ###
+    humedo = 1 if hum > 70 else 0  # Alta humedad
+    
+    ### CÁLCULO DE CONFORT SEGÚN TEMPERATURA ###
+    if temp < 15:
+        return 0 + humedo
+    elif temp < 20:
+        return 2 + humedo
+    elif temp < 24:
+        # Zona de confort óptima (baja humedad: < 30%)
+        if hum < 30:
+            return 6
+        return 4 + humedo
+    elif temp < 28:
+        return 7 + humedo
+    elif temp < 32:
+        return 9 + humedo
+    else:  # temp >= 32
+        return 11 + humedo
 
 def calcular_confort_termico(temp, hum):
     """
@@ -276,50 +511,18 @@ def calcular_confort_termico(temp, hum):
     Retorna: String describiendo el confort, o "ANOMALIA" si datos inválidos
     """
     ### VALIDACIÓN DE ENTRADA ###
-    if temp is None or hum is None:
-        return ANOMALIA
-    
-    # Manejar string ANOMALIA
-    if isinstance(temp, str) and temp == ANOMALIA:
-        return ANOMALIA
-    if isinstance(hum, str) and hum == ANOMALIA:
+    # Comparación por identidad: main.py usa este mismo objeto ANOMALIA
+    if temp is None or hum is None or temp is ANOMALIA or hum is ANOMALIA:
         return ANOMALIA
     
-    # Convertir a números
+    # Convertir a números (cualquier otro string cae en el except)
     try:
         temp = float(temp)
         hum = float(hum)
     except (ValueError, TypeError):
         return ANOMALIA
     
-    ### CLASIFICACIÓN DE HUMEDAD ###
-    es_humedo = hum > 70  # Alta humedad
-    es_seco = hum < 30    # Baja humedad
-    
-    ### CÁLCULO DE CONFORT SEGÚN TEMPERATURA ###
-    if temp < 15:
-        return "Frio Humedo" if es_humedo else "Frio"
-    
-    elif 15 <= temp < 20:
-        return "Fresco Humedo" if es_humedo else "Fresco"
-    
-    elif 20 <= temp < 24:
-        # Zona de confort óptima
-        if es_seco:
-            return "Confortable Seco"
-        elif es_humedo:
-            return "Confortable Humedo"
-        else:
-            return "Confortable"
-    
-    elif 24 <= temp < 28:
-        return "Tibio Humedo" if es_humedo else "Tibio"
-    
-    elif 28 <= temp < 32:
-        return "Caluroso Humedo" if es_humedo else "Caluroso"
-    
-    else:  # temp >= 32
-        return "Muy Caluroso Humedo" if es_humedo else "Muy Caluroso"
+    return _CONFORT_NOMBRES[_confort_codigo(temp, hum)]
 
 def descripcion_luminosidad(pct):
     """
@@ -347,16 +550,7 @@ def descripcion_luminosidad(pct):
         return "Desconocido"
     
     ### CLASIFICACIÓN POR UMBRALES ###
-    if pct >= UMBRAL_MUY_LUMINOSO:
-        return "Muy Luminoso"
-    elif pct >= UMBRAL_LUMINOSO:
-        return "Luminoso"
-    elif pct >= UMBRAL_MEDIO:
-        return "Iluminacion Media"
-    elif pct >= UMBRAL_TENUE:
-        return "Tenue"
-    else:
-        return "Oscuro"
+    return _LUZ_NOMBRES[bisect_right(_LUZ_UMBRALES, pct)]
 
 def estado_dia_noche(pct, umbral_dia=60.0, umbral_noche=30.0):
     """
@@ -411,9 +605,11 @@ class MovingAverage:
         if size <= 0:
             size = 3
         self.size = int(size)
-        self.buf = [0.0] * self.size  # Buffer circular
+        # Buffer circular en array de floats (almacenamiento compacto en C)
+        self.buf = array.array('f', [0.0] * self.size)
         self.count = 0  # Cantidad de valores válidos
         self.idx = 0    # Índice de escritura actual
+        self._sum = 0.0  # Suma acumulada del buffer (avg() en O(1))
 
     def add(self, v):
         """
@@ -423,13 +619,22 @@ class MovingAverage:
         Args:
             v: Valor numérico a añadir (se convierte a float)
         """
-        try:
-            val = float(v)
-        except Exception:
-            return  # Ignorar valores no numéricos
+        # Camino rápido para float/int (lo habitual); try/except solo si no
+        t = type(v)
+        if t is float or t is int:
+            val = v
+        else:
+            try:
+                val = float(v)
+            except Exception:
+                return  # Ignorar valores no numéricos
         
-        # Escribir en posición actual y avanzar índice
+        # Escribir en posición actual, actualizar la suma y avanzar índice
+        # (se suma el valor ya guardado en float32 para que la suma coincida
+        # con la de los elementos del buffer)
+        old = self.buf[self.idx]
         self.buf[self.idx] = val
+        self._sum += self.buf[self.idx] - old
         self.idx = (self.idx + 1) % self.size  # Circular
         
         # Incrementar contador hasta llenar el buffer
@@ -445,9 +650,28 @@ class MovingAverage:
         if self.count == 0:
             return None
         
-        # Sumar solo valores válidos
-        s = 0.0
-        for i in range(self.count):
-            s += self.buf[i]
-        
-        return s / self.count
\ No newline at end of file
+        return self._sum / self.count
+
+# ==================== SELECCIÓN DE MODO ====================
+
+def _sin_simulacion(*args, **kwargs):
+    """
+    Sustituto de las funciones simuladas con MODO_SIMULACION=False
+    
+    Retorna: None (simulación desactivada)
+    """
+    return None
+
+### FUNCIONES SIMULADAS PÚBLICAS ###
+# MODO_SIMULACION se fija antes de arrancar: se decide una sola vez al
+# importar qué función queda publicada, en lugar de comprobarlo en cada
+# lectura. Los llamadores usan los mismos nombres de siempre.
+if MODO_SIMULACION:
+    _init_tablas()
+    obtener_temperatura_simulada = _sim_temperatura
+    obtener_humedad_simulada = _sim_humedad
+    obtener_luminosidad_simulada = _sim_luminosidad
+else:
+    obtener_temperatura_simulada = _sin_simulacion
+    obtener_humedad_simulada = _sin_simulacion
+    obtener_luminosidad_simulada = _sin_simulacion
\ No newline at end of file